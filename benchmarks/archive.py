@@ -0,0 +1,141 @@
+"""
+Hot-path latency as roster history grows, with and without archiving.
+
+For each history length, builds a synthetic church, times the hot requests
+(member dashboard, admin roster, substitutions and generate_roster), archives
+everything older than --keep-days, and times them again. With archiving, the
+hot tables stay the same size however many years of history exist, so the
+archived timings should stay flat.
+
+    python -m benchmarks.archive
+    python -m benchmarks.archive --years 1 5 20 --members 100 --separate-file
+
+Exits with status 1 if, after archiving, any request's median with the longest
+history is slower than with the shortest by more than --tolerance.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from duty_roster_app.database.db import get_db
+from duty_roster_app.utils.archive import archive_history
+
+from benchmarks.run import client_for, make_app, time_call
+
+
+def hot_paths(app, church):
+    """Return {name: callable} for the requests every page view or generator run pays for."""
+    admin = client_for(app, church['admin_id'], 'admin', church['church_id'])
+    member = client_for(app, church['member_ids'][0], 'member', church['church_id'])
+    today = datetime.date.today()
+
+    def get(client, url):
+        def fn():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        return fn
+
+    def generate():
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = admin.post('/admin/generate_roster', data={'month': today.month, 'year': today.year})
+        assert response.status_code == 302, response.status_code
+
+    return {
+        'member.dashboard': get(member, '/member/dashboard'),
+        'admin.roster': get(admin, '/admin/roster'),
+        'admin.substitutions': get(admin, '/admin/substitutions'),
+        'admin.generate_roster': generate,
+    }
+
+
+def table_sizes(app):
+    with app.app_context():
+        db = get_db()
+        return {table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('duty_roster', 'substitution_requests')}
+
+
+def run_one(years, params, tmp):
+    database = os.path.join(tmp, f'history_{years}y.db')
+    app, church = make_app(database, argparse.Namespace(
+        members=params.members, services=params.services, activities=params.activities,
+        years=years, seed=params.seed
+    ))
+    app.config['ARCHIVE_SEPARATE_FILE'] = params.separate_file
+    result = {'years': years, 'before': {'rows': table_sizes(app)}, 'after': {}}
+
+    for name, fn in hot_paths(app, church).items():
+        result['before'][name] = time_call(fn, params.repeat)
+
+    with app.app_context():
+        start = time.perf_counter()
+        duties, requests = archive_history(
+            get_db(), datetime.date.today() - datetime.timedelta(days=params.keep_days)
+        )
+        result['archive'] = {'duties': duties, 'substitution_requests': requests,
+                             'seconds': round(time.perf_counter() - start, 3)}
+    result['after']['rows'] = table_sizes(app)
+
+    for name, fn in hot_paths(app, church).items():
+        result['after'][name] = time_call(fn, params.repeat)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 4, 12], help='history lengths to compare')
+    parser.add_argument('--members', type=int, default=100)
+    parser.add_argument('--services', type=int, default=3)
+    parser.add_argument('--activities', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--keep-days', type=int, default=365, help='archive duties older than this')
+    parser.add_argument('--separate-file', action='store_true', help='archive into a sibling database file')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed growth of an archived median across history lengths (0.5 = 50%%)')
+    parser.add_argument('--output', help='write results JSON here')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    params = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run_one(years, params, tmp) for years in sorted(params.years)]
+
+    if params.output:
+        with open(params.output, 'w') as f:
+            f.write(json.dumps({'params': vars(params), 'results': results}, indent=2) + '\n')
+
+    names = [name for name in results[0]['before'] if name != 'rows']
+    print(f"{'history':<10}{'hot rows':>18}{'archived':>10}{'archive s':>11}")
+    for result in results:
+        rows = f"{result['before']['rows']['duty_roster']} -> {result['after']['rows']['duty_roster']}"
+        print(f"{result['years']:>3} years {rows:>18}{result['archive']['duties']:>10}"
+              f"{result['archive']['seconds']:>11.2f}")
+    print()
+    print(f"{'median ms':<24}" + ''.join(f"{str(r['years']) + 'y before':>12}{str(r['years']) + 'y after':>12}"
+                                         for r in results))
+    for name in names:
+        print(f'{name:<24}' + ''.join(f"{r['before'][name]['median_ms']:>12.2f}{r['after'][name]['median_ms']:>12.2f}"
+                                      for r in results))
+
+    failures = []
+    for name in names:
+        shortest = results[0]['after'][name]['median_ms']
+        longest = results[-1]['after'][name]['median_ms']
+        if shortest and longest / shortest > 1 + params.tolerance:
+            failures.append(f'{name}: {shortest:.2f}ms with {results[0]["years"]} years of history, '
+                            f'{longest:.2f}ms with {results[-1]["years"]} after archiving')
+    for failure in failures:
+        print(f'NOT FLAT: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Concurrent load test simulating Sunday-morning traffic against one SQLite file.
+
+Many members refresh their dashboard, request substitutions and log in while an
+admin regenerates the roster, views it and approves substitutions. Each client runs
+weighted scenarios in its own thread, either against the app in-process (one Flask
+test client per thread) or against a local threaded WSGI server over HTTP.
+
+    python -m benchmarks.loadtest --clients 50 --duration 30
+    python -m benchmarks.loadtest --server wsgi --clients 200 --output load.json
+
+Reports throughput, p50/p95/p99 latency, errors and "database is locked" failures
+per endpoint. Exits with status 1 if locked errors exceed --max-locked or the error
+rate exceeds --max-error-rate, so it can gate concurrency-related changes.
+"""
+import argparse
+import contextlib
+import datetime
+import http.cookiejar
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from duty_roster_app.database.db import query_db
+from benchmarks.run import make_app
+
+# (scenario, weight, role)
+SCENARIOS = [
+    ('member.dashboard', 70, 'member'),
+    ('auth.login', 6, 'member'),
+    ('member.request_substitution', 5, 'member'),
+    ('admin.roster', 6, 'admin'),
+    ('admin.substitutions', 8, 'admin'),
+    ('admin.generate_roster', 2, 'admin'),
+    ('admin.eligibility', 3, 'admin'),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def add_locked_marker(app):
+    """Turn 'database is locked' into a recognizable 503 instead of a generic 500."""
+    @app.errorhandler(sqlite3.OperationalError)
+    def handle_operational_error(e):
+        if 'locked' in str(e):
+            return 'database is locked', 503, {'X-Database-Locked': '1'}
+        raise e
+
+
+def session_cookie(app, user_id, role, church_id):
+    serializer = app.session_interface.get_signing_serializer(app)
+    return serializer.dumps({'user_id': user_id, 'role': role, 'church_id': church_id})
+
+
+class InProcessClient:
+    """One Flask test client per simulated user."""
+
+    def __init__(self, app, cookie):
+        self.client = app.test_client()
+        if cookie:
+            self.client.set_cookie(app.config['SESSION_COOKIE_NAME'], cookie)
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.headers.get('X-Database-Locked') == '1'
+
+
+class HttpClient:
+    """Talks to the WSGI server over HTTP, keeping cookies but not following redirects."""
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url, app, cookie):
+        self.base_url = base_url
+        jar = http.cookiejar.CookieJar()
+        if cookie:
+            host = urllib.parse.urlparse(base_url).hostname
+            jar.set_cookie(http.cookiejar.Cookie(
+                0, app.config['SESSION_COOKIE_NAME'], cookie, None, False, host, False, False,
+                '/', True, False, None, False, None, None, {}))
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), self._NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('X-Database-Locked') == '1'
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('X-Database-Locked') == '1'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Fixture:
+    """Ids and emails the scenarios pick from, loaded once before the run."""
+
+    def __init__(self, app, church):
+        self.church = church
+        self.lock = threading.Lock()
+        today = datetime.date.today()
+        with app.app_context():
+            self.members = [dict(row) for row in query_db(
+                'SELECT id, email FROM users WHERE church_id = ? AND role = ?',
+                [church['church_id'], 'member'])]
+            self.future_duties = {}
+            for row in query_db('SELECT id, user_id FROM duty_roster WHERE church_id = ? AND duty_date >= ?',
+                                [church['church_id'], today.isoformat()]):
+                self.future_duties.setdefault(row['user_id'], []).append(row['id'])
+            self.pending = [row['id'] for row in query_db(
+                "SELECT id FROM substitution_requests WHERE status = 'pending'")]
+
+    def take_pending(self):
+        with self.lock:
+            return self.pending.pop() if self.pending else None
+
+
+def run_scenario(name, client, fixture, member, rng):
+    """Issue the request(s) for one scenario; returns (status, locked)."""
+    today = datetime.date.today()
+    if name == 'member.dashboard':
+        return client.request('GET', '/member/dashboard')
+    if name == 'auth.login':
+        return client.request('POST', '/login', {'email': member['email'], 'password': 'memberpass'})
+    if name == 'member.request_substitution':
+        duties = fixture.future_duties.get(member['id'])
+        if not duties:
+            return client.request('GET', '/member/dashboard')
+        substitute = rng.choice(fixture.members)
+        return client.request('POST', f'/member/request_substitution/{rng.choice(duties)}',
+                              {'substitute_email': substitute['email'], 'message': 'Load test'})
+    if name == 'admin.roster':
+        return client.request('GET', '/admin/roster')
+    if name == 'admin.substitutions':
+        request_id = fixture.take_pending()
+        if request_id is None:
+            return client.request('GET', '/admin/substitutions')
+        return client.request('POST', '/admin/substitutions', {'request_id': request_id, 'action': 'approve'})
+    if name == 'admin.generate_roster':
+        return client.request('POST', '/admin/generate_roster', {'month': today.month, 'year': today.year})
+    if name == 'admin.eligibility':
+        return client.request('GET', '/admin/eligibility')
+    raise ValueError(name)
+
+
+def worker(index, make_client, fixture, deadline, results, results_lock, seed):
+    rng = random.Random(seed + index)
+    member = fixture.members[index % len(fixture.members)]
+    # Roughly one client in twenty is an admin; the rest are members.
+    role = 'admin' if index % 20 == 0 else 'member'
+    scenarios = [(name, weight) for name, weight, scenario_role in SCENARIOS if scenario_role == role]
+    names = [name for name, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+    if role == 'admin':
+        client = make_client(fixture.church['admin_id'], 'admin')
+    else:
+        client = make_client(member['id'], 'member')
+
+    local = []
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            status, locked = run_scenario(name, client, fixture, member, rng)
+        except Exception as e:
+            status, locked = 599, 'locked' in str(e)
+        local.append((name, time.perf_counter() - start, status, locked))
+    with results_lock:
+        results.extend(local)
+
+
+def summarize(samples, duration):
+    by_endpoint = {}
+    for name, elapsed, status, locked in samples:
+        by_endpoint.setdefault(name, []).append((elapsed, status, locked))
+
+    def stats(rows):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in rows)
+        return {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / duration, 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'errors': sum(1 for _, status, _ in rows if status >= 500),
+            'database_locked': sum(1 for _, _, locked in rows if locked),
+        }
+
+    report = {name: stats(rows) for name, rows in sorted(by_endpoint.items())}
+    report['TOTAL'] = stats([row for rows in by_endpoint.values() for row in rows])
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['inprocess', 'wsgi'], default='inprocess')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds')
+    parser.add_argument('--members', type=int, default=300)
+    parser.add_argument('--services', type=int, default=3)
+    parser.add_argument('--activities', type=int, default=6)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--max-locked', type=int, default=0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    params = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        app, church = make_app(os.path.join(tmp, 'load.db'), params)
+        app.config['TESTING'] = False
+        add_locked_marker(app)
+        fixture = Fixture(app, church)
+
+        server = None
+        if params.server == 'wsgi':
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+            def make_client(user_id, role):
+                return HttpClient(base_url, app, session_cookie(app, user_id, role, church['church_id']))
+        else:
+            def make_client(user_id, role):
+                return InProcessClient(app, session_cookie(app, user_id, role, church['church_id']))
+
+        results, results_lock = [], threading.Lock()
+        # generate_roster "emails" every assignment to stdout; keep that out of the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            deadline = start + params.duration
+            threads = [threading.Thread(target=worker,
+                                        args=(i, make_client, fixture, deadline, results, results_lock, params.seed))
+                       for i in range(params.clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'params': vars(params),
+            'elapsed_seconds': round(elapsed, 2),
+        },
+        'endpoints': summarize(results, elapsed),
+    }
+    if params.output:
+        with open(params.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{'endpoint':<30}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}{'locked':>8}")
+    for name, row in report['endpoints'].items():
+        print(f"{name:<30}{row['requests']:>8}{row['throughput_rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['errors']:>8}{row['database_locked']:>8}")
+
+    total = report['endpoints']['TOTAL']
+    error_rate = total['errors'] / total['requests'] if total['requests'] else 0.0
+    if total['database_locked'] > params.max_locked or error_rate > params.max_error_rate:
+        print(f"FAILED: {total['database_locked']} locked, error rate {error_rate:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Benchmarks for the scheduling and request hot paths.
+
+Builds a synthetic church in a throwaway database, times generate_roster, roster,
+eligibility and member.dashboard through the Flask test client and the scheduler
+directly, then writes the results as JSON and compares them with a stored baseline.
+
+    python -m benchmarks.run                          # compare with benchmarks/baseline.json
+    python -m benchmarks.run --members 400 --years 5 --output results.json
+    python -m benchmarks.run --save-baseline          # record a new baseline
+
+Exits with status 1 if any benchmark's median is slower than the baseline by more
+than --tolerance.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from duty_roster_app.app import create_app
+from duty_roster_app.database.db import get_db, init_db, query_db
+from duty_roster_app.utils.scheduler import build_roster, month_bounds
+from duty_roster_app.utils.synthetic import build_church
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def time_call(fn, repeat, warmup=1):
+    """Run fn warmup + repeat times and return timing stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def make_app(database, params):
+    """Create an app on a fresh database holding one synthetic church."""
+    app = create_app({'DATABASE': database, 'TESTING': True})
+    with app.app_context():
+        init_db()
+        church = build_church(
+            get_db(), members=params.members, services=params.services,
+            activities=params.activities, years=params.years, seed=params.seed
+        )
+        get_db().commit()
+    return app, church
+
+
+def client_for(app, user_id, role, church_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = role
+        session['church_id'] = church_id
+    return client
+
+
+def run_benchmarks(params):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app, church = make_app(os.path.join(tmp, 'bench.db'), params)
+        admin = client_for(app, church['admin_id'], 'admin', church['church_id'])
+        member = client_for(app, church['member_ids'][0], 'member', church['church_id'])
+        today = datetime.date.today()
+
+        def get(client, url):
+            def fn():
+                response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+            return fn
+
+        def generate():
+            # generate_roster "emails" every assignment to stdout; keep that out of the timings.
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = admin.post('/admin/generate_roster',
+                                      data={'month': today.month, 'year': today.year})
+            assert response.status_code == 302, response.status_code
+
+        results['generate_roster'] = time_call(generate, params.repeat)
+        results['roster'] = time_call(get(admin, '/admin/roster'), params.repeat)
+        results['eligibility'] = time_call(get(admin, '/admin/eligibility'), params.repeat)
+        results['member.dashboard'] = time_call(get(member, '/member/dashboard'), params.repeat)
+
+        with app.app_context():
+            church_id = church['church_id']
+            services = query_db('SELECT * FROM worship_services WHERE church_id = ?', [church_id])
+            members = query_db('SELECT * FROM users WHERE church_id = ? AND role = "member"', [church_id])
+            eligibility = {}
+            for record in query_db('SELECT user_id, activity FROM activity_eligibility WHERE church_id = ?',
+                                   [church_id]):
+                eligibility.setdefault(record['activity'], []).append(record['user_id'])
+            start_date, _ = month_bounds(today.year, today.month)
+            end_date = datetime.date(today.year + 1, today.month, 1)
+            results['scheduler.build_roster_12_months'] = time_call(
+                lambda: build_roster(services, members, eligibility, start_date, end_date),
+                params.repeat
+            )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of (name, baseline_ms, current_ms, ratio, regressed) rows."""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            rows.append((name, None, current['median_ms'], None, False))
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        rows.append((name, previous['median_ms'], current['median_ms'], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--services', type=int, default=3)
+    parser.add_argument('--activities', type=int, default=6)
+    parser.add_argument('--years', type=int, default=3, help='years of roster history')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of the median before failing (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    params = parse_args(argv)
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {k: getattr(params, k) for k in ('members', 'services', 'activities', 'years', 'seed', 'repeat')},
+        },
+        'results': run_benchmarks(params),
+    }
+
+    output = json.dumps(report, indent=2)
+    if params.save_baseline:
+        with open(params.baseline, 'w') as f:
+            f.write(output + '\n')
+        print(f'Baseline written to {params.baseline}', file=sys.stderr)
+        return 0
+    if params.output:
+        with open(params.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if not os.path.exists(params.baseline):
+        print(f'No baseline at {params.baseline}; run with --save-baseline to create one.', file=sys.stderr)
+        return 0
+    with open(params.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('params') != report['meta']['params']:
+        print('Warning: baseline was recorded with different parameters.', file=sys.stderr)
+
+    regressed = False
+    print(f"{'benchmark':<36}{'baseline':>12}{'current':>12}{'change':>10}", file=sys.stderr)
+    for name, before, after, ratio, is_regression in compare(report['results'], baseline, params.tolerance):
+        before_text = f'{before:.2f}ms' if before is not None else '-'
+        change = f'{(ratio - 1) * 100:+.0f}%' if ratio is not None else 'new'
+        flag = '  REGRESSION' if is_regression else ''
+        print(f'{name:<36}{before_text:>12}{after:>10.2f}ms{change:>10}{flag}', file=sys.stderr)
+        regressed = regressed or is_regression
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Cold-start check for create_app().
+
+Starts a fresh interpreter several times, imports the package and builds the app
+under `python -X importtime`, and fails if the median wall time exceeds the budget
+or if a module that should load lazily (the Gemini SDK, gRPC, protobuf,
+multiprocessing) was imported during start-up.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 300 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_CODE = 'from duty_roster_app.app import create_app; create_app()'
+
+# Modules that only specific requests need; importing them at start-up is a regression.
+LAZY_MODULES = ('google.generativeai', 'grpc', 'google.protobuf', 'multiprocessing')
+
+
+def run_once():
+    """Return (wall seconds, [(cumulative_us, self_us, module)]) for one cold start."""
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+                          capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f'create_app() failed:\n{proc.stderr}')
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us), int(self_us), module.strip()))
+    return elapsed, imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=400.0, help='maximum median cold-start time')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='show the N slowest imports')
+    params = parser.parse_args(argv)
+
+    timings = []
+    imports = []
+    for _ in range(params.repeat):
+        elapsed, imports = run_once()
+        timings.append(elapsed * 1000)
+    median_ms = statistics.median(timings)
+
+    print(f'create_app() cold start: median {median_ms:.0f} ms over {params.repeat} runs '
+          f'(budget {params.budget_ms:.0f} ms)')
+    print('Slowest imports (cumulative):')
+    for cumulative_us, self_us, module in sorted(imports, reverse=True)[:params.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {module}')
+
+    failures = []
+    if median_ms > params.budget_ms:
+        failures.append(f'median start-up {median_ms:.0f} ms exceeds the {params.budget_ms:.0f} ms budget')
+    loaded = {module for _, _, module in imports}
+    for lazy in LAZY_MODULES:
+        if any(module == lazy or module.startswith(lazy + '.') for module in loaded):
+            failures.append(f'{lazy} was imported at start-up; it should load lazily')
+
+    for failure in failures:
+        print(f'FAILED: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
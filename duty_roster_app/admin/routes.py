@@ -1,12 +1,22 @@
-from flask import Blueprint, session, redirect, url_for, request, flash, render_template, jsonify
-from werkzeug.security import generate_password_hash
+from flask import Blueprint, session, redirect, url_for, request, flash, render_template, jsonify, Response, stream_with_context
 import datetime
 import random
 import json
-from ..database.db import get_db, query_db
+from ..database.db import get_db, get_directory_db, query_db, sync_shard_users
 from ..auth.routes import admin_required
 from ..utils.email import send_email
 from ..utils.ai import generate_gemini_message
+from ..utils.passwords import PasswordPoolBusy, hash_password, hash_passwords
+from ..utils.metrics import render_prometheus
+from ..utils.scheduler import build_roster, month_bounds
+from ..utils.synthetic import member_identity
+from ..utils.export import EXPORT_FORMATS, STREAMERS, iter_roster_rows
+from ..utils.calendar_feed import invalidate_feeds
+from ..utils.duty_load import duty_load_totals, forget_duties, reassign_duty
+from ..utils.archive import has_archived_duties
+from ..utils.member_import import (ImportAborted, detect_format, import_members as run_member_import,
+                                   iter_member_rows, open_text_stream)
+from ..utils.service_batch import ServiceBatchError, apply_service_batch, serialize_services
 
 bp = Blueprint('admin', __name__)
 
@@ -18,6 +28,12 @@ def dashboard():
     church = query_db('SELECT * FROM churches WHERE id = ?', [church_id], one=True)
     return render_template('admin_dashboard.html', church=church)
 
+@bp.route('/metrics')
+@admin_required
+def metrics():
+    """Request latency, SQL and template metrics for this worker in Prometheus format."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/setup', methods=['GET', 'POST'])
 @admin_required
 def setup():
@@ -40,6 +56,7 @@ def setup():
                 db.execute('INSERT INTO worship_services (church_id, day, time, activities) VALUES (?, ?, ?, ?)',
                            (church_id, day.strip(), time_val.strip(), activities.strip()))
         db.commit()
+        invalidate_feeds(church_id=church_id)
         flash('Church setup updated')
         return redirect(url_for('admin.setup'))
 
@@ -101,73 +118,35 @@ def generate_roster():
             eligibility[record['activity']].append(record['user_id'])
 
         db = get_db()
-        start_date = datetime.date(year, month, 1)
-        if month == 12:
-            end_date = datetime.date(year + 1, 1, 1)
-        else:
-            end_date = datetime.date(year, month + 1, 1)
+        start_date, end_date = month_bounds(year, month)
+        # archive-history --before can reach past ARCHIVE_AFTER_DAYS, so always look.
+        if has_archived_duties(db, church_id, start_date, end_date):
+            flash('That month has been archived and can no longer be regenerated.')
+            return redirect(url_for('admin.generate_roster'))
 
+        assignments = build_roster(services, members, eligibility, start_date, end_date)
+        month_range = (start_date.isoformat(), end_date.isoformat())
+        forget_duties(db, church_id, 'duty_date >= ? AND duty_date < ?', month_range,
+                      replacements=[(duty_date, activity, member['id'])
+                                    for duty_date, activity, member, _ in assignments])
         db.execute(
             'DELETE FROM duty_roster WHERE church_id = ? AND duty_date >= ? AND duty_date < ?',
-            (church_id, start_date.isoformat(), end_date.isoformat())
+            (church_id, *month_range)
         )
-
-        day_to_weekday = {
-            'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
-            'Friday': 4, 'Saturday': 5, 'Sunday': 6
-        }
-
-        activity_member_index = {}
-        date_iter = start_date
-        while date_iter < end_date:
-            for service in services:
-                service_day = service['day'].strip().title()
-                service_weekday = day_to_weekday.get(service_day)
-                
-                if service_weekday == date_iter.weekday():
-                    activities = list(set([act.strip() for act in service['activities'].split(',')]))
-                    assigned_activities = set()
-                    
-                    for activity in activities:
-                        if activity in assigned_activities:
-                            continue
-                            
-                        eligible_member_ids = eligibility.get(activity, [])
-                        if not eligible_member_ids:
-                            continue
-                            
-                        eligible_members = [m for m in members if m['id'] in eligible_member_ids]
-                        if not eligible_members:
-                            continue
-                            
-                        if activity not in activity_member_index:
-                            activity_member_index[activity] = 0
-                            
-                        member = eligible_members[activity_member_index[activity] % len(eligible_members)]
-                        activity_member_index[activity] += 1
-                        
-                        existing_assignment = query_db(
-                            '''SELECT * FROM duty_roster 
-                               WHERE church_id = ? AND duty_date = ? AND activity = ?''',
-                            [church_id, date_iter.isoformat(), activity],
-                            one=True
-                        )
-                        
-                        if not existing_assignment:
-                            db.execute(
-                                'INSERT INTO duty_roster (church_id, duty_date, activity, user_id) VALUES (?, ?, ?, ?)',
-                                (church_id, date_iter.isoformat(), activity, member['id'])
-                            )
-                            assigned_activities.add(activity)
-                            send_email(
-                                member['email'],
-                                "Duty Roster Assignment",
-                                f"You are assigned to {activity} on {date_iter.isoformat()} at {service['time']}."
-                            )
-            
-            date_iter += datetime.timedelta(days=1)
+        db.executemany(
+            'INSERT INTO duty_roster (church_id, duty_date, activity, user_id) VALUES (?, ?, ?, ?)',
+            [(church_id, duty_date.isoformat(), activity, member['id'])
+             for duty_date, activity, member, _ in assignments]
+        )
+        for duty_date, activity, member, service in assignments:
+            send_email(
+                member['email'],
+                "Duty Roster Assignment",
+                f"You are assigned to {activity} on {duty_date.isoformat()} at {service['time']}."
+            )
 
         db.commit()
+        invalidate_feeds(church_id=church_id)
         flash('Duty roster generated successfully.')
         return redirect(url_for('admin.roster'))
 
@@ -231,14 +210,48 @@ def roster():
                          assignments_by_service=assignments_by_service,
                          sorted_service_keys=sorted_service_keys)
 
+@bp.route('/roster/export')
+@admin_required
+def export_roster():
+    """Stream the roster for a date range as CSV, JSON Lines or XLSX without loading it into memory."""
+    church_id = session.get('church_id')
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        flash(f'Unknown export format: {fmt}')
+        return redirect(url_for('admin.roster'))
+    try:
+        start = datetime.date.fromisoformat(request.args['start']) if request.args.get('start') else datetime.date.min
+        end = datetime.date.fromisoformat(request.args['end']) if request.args.get('end') else datetime.date.max
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.')
+        return redirect(url_for('admin.roster'))
+    if end < start:
+        flash('The end date must not be before the start date.')
+        return redirect(url_for('admin.roster'))
+
+    # The range is inclusive of the end date.
+    end_exclusive = end.isoformat() if end == datetime.date.max else (end + datetime.timedelta(days=1)).isoformat()
+    rows = iter_roster_rows(church_id, start.isoformat(), end_exclusive,
+                            include_archive=request.args.get('archived') == '1')
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"roster_{request.args.get('start') or 'all'}_{request.args.get('end') or 'all'}.{extension}"
+    return Response(
+        stream_with_context(STREAMERS[fmt](rows)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @bp.route('/roster/delete_all', methods=['POST'])
 @admin_required
 def delete_all_rosters():
     """Delete all duty roster entries for the admin's church."""
     church_id = session.get('church_id')
     db = get_db()
+    # Archived history stays counted in the duty-load rollup.
+    forget_duties(db, church_id, '1')
     db.execute('DELETE FROM duty_roster WHERE church_id = ?', [church_id])
     db.commit()
+    invalidate_feeds(church_id=church_id)
     flash('All roster assignments have been deleted.')
     return redirect(url_for('admin.roster'))
 
@@ -248,9 +261,11 @@ def delete_service_roster(date, time):
     """Delete all duty roster entries for a specific service date and time."""
     church_id = session.get('church_id')
     db = get_db()
+    forget_duties(db, church_id, 'duty_date = ?', [date])
     db.execute('DELETE FROM duty_roster WHERE church_id = ? AND duty_date = ?', 
                [church_id, date])
     db.commit()
+    invalidate_feeds(church_id=church_id)
     flash(f'Roster assignments for {date} at {time} have been deleted.')
     return redirect(url_for('admin.roster'))
 
@@ -277,6 +292,9 @@ def substitutions():
             return redirect(url_for('admin.substitutions'))
 
         if action == 'approve':
+            duty = query_db('SELECT duty_date, activity, user_id FROM duty_roster WHERE id = ?',
+                            [sub_req['duty_id']], one=True)
+            reassign_duty(db, church_id, duty, sub_req['requested_substitute_id'])
             db.execute('UPDATE substitution_requests SET status = ? WHERE id = ?', ('approved', req_id))
             db.execute('UPDATE duty_roster SET user_id = ? WHERE id = ?', 
                       (sub_req['requested_substitute_id'], sub_req['duty_id']))
@@ -293,6 +311,7 @@ def substitutions():
                          "You have been assigned a new duty.")
 
             db.commit()
+            invalidate_feeds(church_id=church_id)
 
         elif action == 'deny':
             db.execute('UPDATE substitution_requests SET status = ? WHERE id = ?', ('denied', req_id))
@@ -313,6 +332,57 @@ def substitutions():
     )
     return render_template('admin_substitutions.html', requests=requests_list)
 
+def _duty_load_report(church_id):
+    """
+    Build the duty-load report from the rollup for ?start=YYYY-MM&end=YYYY-MM (default:
+    the current year) and an optional ?activity=. Returns (report, error message).
+    """
+    year = datetime.date.today().year
+    start = request.args.get('start') or f'{year}-01'
+    end = request.args.get('end') or f'{year}-12'
+    try:
+        for value in (start, end):
+            datetime.datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        return None, 'Months must be in YYYY-MM format.'
+    if end < start:
+        return None, 'The end month must not be before the start month.'
+    activity = request.args.get('activity') or None
+
+    totals = duty_load_totals(get_db(), church_id, start, end, activity)
+    members = query_db(
+        'SELECT id, name FROM users WHERE church_id = ? AND role = "member" ORDER BY name',
+        [church_id]
+    )
+    activities = sorted({act for counts in totals.values() for act in counts})
+    rows = [{
+        'user_id': member['id'],
+        'name': member['name'],
+        'activities': totals.get(member['id'], {}),
+        'total': sum(totals.get(member['id'], {}).values()),
+    } for member in members]
+    return {'start': start, 'end': end, 'activity': activity,
+            'activities': activities, 'members': rows}, None
+
+@bp.route('/reports/duty_load')
+@admin_required
+def duty_load_report():
+    """Duties per member and activity over a range of months, read from the rollup."""
+    report, error = _duty_load_report(session.get('church_id'))
+    if error:
+        flash(error)
+        return redirect(url_for('admin.duty_load_report'))
+    return render_template('admin_duty_load.html', report=report)
+
+@bp.route('/api/duty_load')
+@admin_required
+def duty_load_api():
+    """JSON form of the duty-load report."""
+    report, error = _duty_load_report(session.get('church_id'))
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    return jsonify({'success': True, **report})
+
 @bp.route('/eligibility', methods=['GET', 'POST'])
 @admin_required
 def eligibility():
@@ -374,38 +444,62 @@ def eligibility():
 @admin_required
 def generate_dummy_members():
     church_id = session.get('church_id')
-    db = get_db()
+    db = get_directory_db()
     if request.method == 'POST':
         db.execute('DELETE FROM users WHERE church_id = ? AND role = "member"', (church_id,))
 
-        first_names = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles",
-                    "Christopher", "Daniel", "Matthew", "Anthony", "Donald", "Mark", "Paul", "Steven", "Andrew", "Kenneth",
-                    "Joshua", "Kevin", "Brian", "George", "Timothy", "Ronald", "Edward", "Jason", "Jeffrey", "Ryan",
-                    "Jacob", "Gary", "Nicholas", "Eric", "Jonathan", "Stephen", "Larry", "Justin", "Scott", "Brandon"]
-        last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
-                    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
-                    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
-                    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores"]
-
         count = int(request.form.get('count', 40)) or 40
+        hashed_pw = hash_password("memberpass")
 
-        for i in range(count):
-            first_name = first_names[i % len(first_names)]  # Use modulo to cycle through names if count > len(first_names)
-            last_name = random.choice(last_names)
-            name = f"{first_name} {last_name}"
-            email = f"{first_name.lower()}.{last_name.lower()}@example.com"
-            hashed_pw = generate_password_hash("memberpass")
-
-            db.execute(
-                'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
-                (name, email, hashed_pw, "member", church_id)
-            )
+        db.executemany(
+            'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
+            [(*member_identity(i, church_id, random), hashed_pw, "member", church_id) for i in range(count)]
+        )
         db.commit()
+        sync_shard_users(church_id)
         flash(f"Inserted {count} dummy members.")
         return redirect(url_for('admin.dashboard'))
 
     return render_template('generate_dummy_members.html')
 
+@bp.route('/import_members', methods=['GET', 'POST'])
+@admin_required
+def import_members():
+    """Bulk-import members from an uploaded CSV, JSON Lines or JSON file."""
+    church_id = session.get('church_id')
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a file to import.')
+            return redirect(url_for('admin.import_members'))
+
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        default_password = request.form.get('default_password') or None
+        error = None
+        try:
+            rows = iter_member_rows(open_text_stream(upload.stream), fmt)
+            report = run_member_import(get_directory_db(), church_id, rows, default_password=default_password,
+                                       hash_many=hash_passwords)
+        except ImportAborted as e:
+            # The batches before the error are committed; say so rather than just "failed".
+            report, error = e.report, e
+        except ValueError as e:
+            flash(f'Import failed: {e}')
+            return redirect(url_for('admin.import_members'))
+        sync_shard_users(church_id)
+
+        status, message = 200, report.summary()
+        if error is not None:
+            status = 503 if isinstance(error.__cause__, PasswordPoolBusy) else 400
+            message = (f'Import stopped after {report.rows_read} rows: {error}. '
+                       f'{report.inserted} members were imported before that.')
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({**report.to_dict(), **({'error': message} if error else {})}), status
+        flash(message)
+        return render_template('admin_import_members.html', report=report), status
+
+    return render_template('admin_import_members.html', report=None)
+
 @bp.route('/service/update', methods=['POST'])
 @admin_required
 def update_service():
@@ -421,6 +515,7 @@ def update_service():
         (data['day'], data['time'], data['activities'], data['id'], church_id)
     )
     db.commit()
+    invalidate_feeds(church_id=church_id)
     return jsonify({'success': True})
 
 @bp.route('/service/add', methods=['POST'])
@@ -439,6 +534,7 @@ def add_service():
     )
     service_id = cursor.lastrowid
     db.commit()
+    invalidate_feeds(church_id=church_id)
     return jsonify({'success': True, 'id': service_id})
 
 @bp.route('/service/delete', methods=['POST'])
@@ -453,8 +549,30 @@ def delete_service():
     db = get_db()
     db.execute('DELETE FROM worship_services WHERE id = ? AND church_id = ?', (data['id'], church_id))
     db.commit()
+    invalidate_feeds(church_id=church_id)
     return jsonify({'success': True})
 
+@bp.route('/service/batch', methods=['POST'])
+@admin_required
+def batch_services():
+    """Apply an ordered list of service adds, updates and deletes in one transaction."""
+    church_id = session.get('church_id')
+    data = request.get_json(silent=True)
+
+    if not data or 'operations' not in data:
+        return jsonify({'success': False, 'error': 'Missing operations'}), 400
+
+    db = get_db()
+    try:
+        result = apply_service_batch(db, church_id, data['operations'])
+    except ServiceBatchError as e:
+        return jsonify({'success': False, 'error': str(e), 'index': e.index}), 400
+
+    if result['added'] or result['updated'] or result['deleted']:
+        invalidate_feeds(church_id=church_id)
+    services = query_db('SELECT * FROM worship_services WHERE church_id = ?', [church_id])
+    return jsonify({'success': True, 'worship_services': serialize_services(services), **result})
+
 
 # admin/routes.py
 
@@ -555,6 +673,7 @@ def parse_worship_setup():
                     }
 
         db.commit()
+        invalidate_feeds(church_id=church_id)
 
         # Finally, reload everything for a fresh list to return to the client.
         updated_rows = query_db(
@@ -562,25 +681,7 @@ def parse_worship_setup():
             [church_id]
         )
 
-        worship_services = []
-        for row in updated_rows:
-            acts = [act.strip() for act in row['activities'].split(',')] if row['activities'] else []
-            worship_services.append({
-                'id': row['id'],
-                'day': row['day'],
-                'time': row['time'],
-                'activities': acts
-            })
-
-        # Sort by day/time for consistent display
-        day_order = {
-            'Sunday': 0, 'Monday': 1, 'Tuesday': 2, 'Wednesday': 3,
-            'Thursday': 4, 'Friday': 5, 'Saturday': 6
-        }
-        worship_services.sort(key=lambda x: (
-            day_order.get(x['day'].strip(), 7),
-            x['time'].strip()
-        ))
+        worship_services = serialize_services(updated_rows)
 
         return jsonify({
             'success': True,
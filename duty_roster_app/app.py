@@ -1,28 +1,40 @@
 import os
 from flask import Flask
-from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
 
 # Use your database package initialization
-from duty_roster_app.database import db
+from duty_roster_app.database import db, profiling
+from duty_roster_app import cli
+from duty_roster_app.utils import archive, calendar_feed, metrics, passwords
 
 # Import blueprints
 from duty_roster_app.auth.routes import bp as auth_bp
 from duty_roster_app.admin.routes import bp as admin_bp
 from duty_roster_app.member.routes import bp as member_bp
 
-def create_app():
+def create_app(test_config=None):
     load_dotenv()  # Loads environment variables from .env
 
     app = Flask(__name__)
     # Use secret key from .env or fall back
     app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'fallback_secret_key')
+    app.config['DATABASE'] = os.environ.get('DATABASE', db.DATABASE)
+    if test_config:
+        # Benchmarks and tests point the app at their own database file
+        app.config.update(test_config)
 
     # Enable CSRF protection
+    # from flask_wtf.csrf import CSRFProtect
     # csrf = CSRFProtect(app)
 
     # Initialize DB from your database/db.py
     db.init_app(app)
+    profiling.init_app(app)
+    cli.init_app(app)
+    passwords.init_app(app)
+    metrics.init_app(app)
+    calendar_feed.init_app(app)
+    archive.init_app(app)
 
     # Register the blueprints
     # auth_bp might or might not use a prefix (depends on your preference).
@@ -39,7 +51,7 @@ def init_sample_data(app):
     you can replicate that logic here, calling db.init_db() etc.
     """
     import os
-    if not os.path.exists(db.DATABASE):
+    if not os.path.exists(app.config['DATABASE']):
         with app.app_context():
             db.init_db()
             database = db.get_db()
@@ -67,25 +79,12 @@ def init_sample_data(app):
 
             # Generate 40 sample members with realistic male names
             import random
-            first_names = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles",
-                         "Christopher", "Daniel", "Matthew", "Anthony", "Donald", "Mark", "Paul", "Steven", "Andrew", "Kenneth",
-                         "Joshua", "Kevin", "Brian", "George", "Timothy", "Ronald", "Edward", "Jason", "Jeffrey", "Ryan",
-                         "Jacob", "Gary", "Nicholas", "Eric", "Jonathan", "Stephen", "Larry", "Justin", "Scott", "Brandon"]
-            last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
-                         "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
-                         "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
-                         "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores"]
-
+            from duty_roster_app.utils.synthetic import member_identity
             hashed_member_pw = generate_password_hash("memberpass")
-            for i in range(40):
-                first_name = first_names[i]
-                last_name = random.choice(last_names)
-                name = f"{first_name} {last_name}"
-                email = f"{first_name.lower()}.{last_name.lower()}@example.com"
-                database.execute(
-                    'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
-                    (name, email, hashed_member_pw, "member", church_id)
-                )
+            database.executemany(
+                'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
+                [(*member_identity(i, church_id, random), hashed_member_pw, "member", church_id) for i in range(40)]
+            )
 
             database.commit()
 
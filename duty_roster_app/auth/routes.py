@@ -1,7 +1,7 @@
 from functools import wraps
 from flask import Blueprint, session, redirect, url_for, request, flash, render_template
-from werkzeug.security import check_password_hash
-from ..database.db import query_db
+from ..database.db import get_directory_db
+from ..utils.passwords import PasswordPoolBusy, needs_rehash, rehash_password, verify_password
 
 bp = Blueprint('auth', __name__)
 
@@ -27,9 +27,26 @@ def login():
         email = request.form['email']
         password = request.form['password']
 
-        # Fetch user by email only
-        user = query_db('SELECT * FROM users WHERE email = ?', [email], one=True)
-        if user and check_password_hash(user['password'], password):
+        # Fetch user by email only (from the directory database when sharded)
+        db = get_directory_db()
+        user = db.execute(
+            'SELECT id, password, role, church_id FROM users WHERE email = ?',
+            [email]
+        ).fetchone()
+        try:
+            valid = user is not None and verify_password(user['password'], password)
+        except PasswordPoolBusy:
+            flash('The server is busy, please try logging in again in a moment.')
+            return render_template('login.html'), 503
+
+        if valid:
+            if needs_rehash(user['password']):
+                try:
+                    db.execute('UPDATE users SET password = ? WHERE id = ?',
+                               (rehash_password(password), user['id']))
+                    db.commit()
+                except PasswordPoolBusy:
+                    pass  # keep the old hash; it will be upgraded on a later login
             # Correct password
             session['user_id'] = user['id']
             session['role'] = user['role']
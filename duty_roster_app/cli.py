@@ -0,0 +1,153 @@
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from duty_roster_app.database.db import get_db, get_directory_db, init_db, sync_shard_users, use_church
+from duty_roster_app.database.sharding import split_database
+from duty_roster_app.utils.archive import archive_history, default_cutoff
+from duty_roster_app.utils.duty_load import rebuild_duty_load
+from duty_roster_app.utils.member_import import ImportAborted, detect_format, import_members, iter_member_rows
+from duty_roster_app.utils.synthetic import build_dataset
+
+
+@click.command('import-members')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--church-id', type=int, required=True, help='Church the members belong to.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'json']),
+              help='Input format (detected from the file extension by default).')
+@click.option('--default-password', help='Password for rows that do not include one.')
+@click.option('--batch-size', type=int, default=500, show_default=True,
+              help='Rows hashed and inserted per transaction.')
+@click.option('--workers', type=int, help='Password hashing processes (defaults to CPU count).')
+@with_appcontext
+def import_members_command(path, church_id, fmt, default_password, batch_size, workers):
+    """Bulk-import members from a CSV, JSON Lines or JSON file."""
+    fmt = fmt or detect_format(path)
+    error = None
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            report = import_members(
+                get_directory_db(), church_id, iter_member_rows(f, fmt),
+                default_password=default_password, batch_size=batch_size, workers=workers,
+                method=current_app.config['PASSWORD_HASH_METHOD']
+            )
+        except ImportAborted as e:
+            report, error = e.report, e
+    sync_shard_users(church_id)
+    for row, message in report.errors:
+        click.echo(f"row {row}: {message}", err=True)
+    if error is not None:
+        raise click.ClickException(f"Import stopped after {report.rows_read} rows: {error}. "
+                                   f"{report.inserted} members were imported before that.")
+    click.echo(report.summary())
+
+
+@click.command('seed-data')
+@click.option('--churches', type=int, default=1, show_default=True)
+@click.option('--members', type=int, default=40, show_default=True, help='Members per church.')
+@click.option('--services', type=int, default=2, show_default=True, help='Worship services per church.')
+@click.option('--activities', type=int, default=4, show_default=True, help='Activities per service.')
+@click.option('--years', type=int, default=1, show_default=True, help='Years of roster history.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Same seed, same data.')
+@click.option('--password', default='memberpass', show_default=True, help='Password for every generated user.')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Date the history runs up to (default today); fix it for identical datasets.')
+@click.option('--reset', is_flag=True, help='Drop and recreate all tables first.')
+@with_appcontext
+def seed_data_command(churches, members, services, activities, years, seed, password, as_of, reset):
+    """Generate synthetic churches, members, eligibility and roster history."""
+    if reset:
+        init_db()
+    db = get_db()
+    # Seeding is disposable data; skip the fsync per transaction.
+    db.execute('PRAGMA synchronous = OFF')
+    start = time.perf_counter()
+    created = build_dataset(db, churches=churches, members=members, services=services,
+                            activities=activities, years=years, seed=seed, password=password,
+                            today=as_of.date() if as_of else None)
+    elapsed = time.perf_counter() - start
+    rows = db.execute('SELECT COUNT(*) FROM duty_roster').fetchone()[0]
+    for church in created:
+        click.echo(f"church {church['church_id']}: admin {church['admin_email']}, "
+                   f"{len(church['member_ids'])} members")
+    click.echo(f"Seeded {len(created)} churches in {elapsed:.2f}s ({rows} roster rows in database)")
+
+
+@click.command('split-shards')
+@click.option('--church-id', 'church_ids', type=int, multiple=True, help='Only split these churches.')
+@click.option('--overwrite', is_flag=True, help='Replace shard files that already exist.')
+@click.option('--prune', is_flag=True, help='Delete the copied per-church rows from the source afterwards.')
+@with_appcontext
+def split_shards_command(church_ids, overwrite, prune):
+    """Split the shared database into one SQLite file per church."""
+    source = current_app.config.get('DIRECTORY_DATABASE') or current_app.config['DATABASE']
+    try:
+        results = split_database(source, list(church_ids) or None, overwrite=overwrite, prune=prune)
+    except FileExistsError as e:
+        raise click.ClickException(f"{e} (use --overwrite to replace it)")
+    for church_id, path, copied in results:
+        click.echo(f"church {church_id}: {copied} rows -> {path}")
+    click.echo(f"Split {len(results)} churches. Set DB_SHARDING=1 to serve from the shards; "
+               f"{source} stays the directory database for logins.")
+
+
+@click.command('rebuild-duty-load')
+@click.option('--church-id', 'church_ids', type=int, multiple=True, help='Only rebuild these churches.')
+@with_appcontext
+def rebuild_duty_load_command(church_ids):
+    """Recompute the duty-load rollup from the roster (also creates it on older databases)."""
+    if not current_app.config.get('DB_SHARDING'):
+        db = get_db()
+        if church_ids:
+            rows = sum(rebuild_duty_load(db, church_id) for church_id in church_ids)
+        else:
+            rows = rebuild_duty_load(db)
+        db.commit()
+        click.echo(f"Rebuilt duty load: {rows} rollup rows")
+        return
+
+    church_ids = list(church_ids) or [row[0] for row in get_directory_db().execute('SELECT id FROM churches')]
+    for church_id in church_ids:
+        use_church(church_id)
+        db = get_db()
+        rows = rebuild_duty_load(db, church_id)
+        db.commit()
+        click.echo(f"church {church_id}: {rows} rollup rows")
+
+
+@click.command('archive-history')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive duties dated before this day (default: ARCHIVE_AFTER_DAYS ago).')
+@click.option('--church-id', 'church_ids', type=int, multiple=True, help='Only archive these churches.')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Duties moved per transaction.')
+@with_appcontext
+def archive_history_command(before, church_ids, batch_size):
+    """Move old duties and their substitution requests into the archive tables."""
+    cutoff = before.date() if before else default_cutoff()
+    if current_app.config.get('DB_SHARDING'):
+        targets = list(church_ids) or [row[0] for row in get_directory_db().execute('SELECT id FROM churches')]
+    else:
+        targets = list(church_ids) or [None]
+
+    start = time.perf_counter()
+    total_duties = total_requests = 0
+    for church_id in targets:
+        if current_app.config.get('DB_SHARDING'):
+            use_church(church_id)
+        duties, requests = archive_history(get_db(), cutoff, church_id=church_id, batch_size=batch_size)
+        if church_id is not None:
+            click.echo(f"church {church_id}: {duties} duties, {requests} substitution requests")
+        total_duties += duties
+        total_requests += requests
+    click.echo(f"Archived {total_duties} duties and {total_requests} substitution requests "
+               f"dated before {cutoff.isoformat()} in {time.perf_counter() - start:.2f}s")
+
+
+def init_app(app):
+    """Register the command-line tools with the Flask app."""
+    app.cli.add_command(import_members_command)
+    app.cli.add_command(seed_data_command)
+    app.cli.add_command(split_shards_command)
+    app.cli.add_command(rebuild_duty_load_command)
+    app.cli.add_command(archive_history_command)
@@ -1,36 +1,212 @@
+import glob
 import os
 import sqlite3
-from flask import g, current_app
+import tempfile
+import threading
+import time
+from flask import g, current_app, has_request_context, session
 
 DATABASE = 'duty_roster.db'
 
+# Callables invoked as hook(connection, sql, params, elapsed_seconds) after every statement.
+_query_hooks = []
+
+# church_id -> lock held while that church's shard is being created in this process.
+_shard_locks = {}
+_shard_locks_lock = threading.Lock()
+
+def add_query_hook(hook):
+    """Register a function to be told about every statement run through get_db()."""
+    if hook not in _query_hooks:
+        _query_hooks.append(hook)
+
+def _report(conn, sql, params, elapsed):
+    for hook in _query_hooks:
+        hook(conn, sql, params, elapsed)
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that reports each statement and its duration to the query hooks."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        cur = super().execute(sql, parameters)
+        _report(self, sql, parameters, time.perf_counter() - start)
+        return cur
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        cur = super().executemany(sql, seq_of_parameters)
+        _report(self, sql, (), time.perf_counter() - start)
+        return cur
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        cur = super().executescript(sql_script)
+        _report(self, sql_script, (), time.perf_counter() - start)
+        return cur
+
+    def fetch_all(self, sql, parameters=()):
+        """Run a query and fetch every row, timing the fetch as part of the statement."""
+        start = time.perf_counter()
+        cur = super().execute(sql, parameters)
+        rows = cur.fetchall()
+        cur.close()
+        _report(self, sql, parameters, time.perf_counter() - start)
+        return rows
+
+def shard_path(church_id):
+    """Path of the SQLite file holding one church's data in sharded mode."""
+    return os.path.join(current_app.config['SHARD_DIR'], f'church_{int(church_id)}.db')
+
+def _connect(path):
+    db = sqlite3.connect(path, factory=TimedConnection)
+    db.row_factory = sqlite3.Row
+    return db
+
+def _current_church_id():
+    church_id = g.get('_church_id')
+    if church_id is None and has_request_context():
+        church_id = session.get('church_id')
+    return church_id
+
+def _directory_path():
+    return current_app.config.get('DIRECTORY_DATABASE') or current_app.config.get('DATABASE', DATABASE)
+
 def get_db():
+    """
+    Connection for the current request. With DB_SHARDING on, requests from a logged-in
+    user go to their church's shard and everything else (login, CLI) to the directory.
+    """
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        church_id = _current_church_id() if current_app.config.get('DB_SHARDING') else None
+        if church_id is None:
+            db = _connect(_directory_path() if current_app.config.get('DB_SHARDING')
+                          else current_app.config.get('DATABASE', DATABASE))
+        else:
+            path = shard_path(church_id)
+            if not os.path.exists(path):
+                create_shard(church_id)
+            db = _connect(path)
+        g._database = db
+    return db
+
+def get_directory_db():
+    """Connection holding users and churches for login; the same as get_db() unless sharded."""
+    if not current_app.config.get('DB_SHARDING'):
+        return get_db()
+    db = getattr(g, '_directory_database', None)
+    if db is None:
+        db = g._directory_database = _connect(_directory_path())
     return db
 
+def use_church(church_id):
+    """Point get_db() at a church's shard outside a logged-in request (CLI, feed tokens)."""
+    if current_app.config.get('DB_SHARDING') and _current_church_id() != church_id:
+        db = g.pop('_database', None)
+        if db is not None:
+            db.close()
+    g._church_id = church_id
+
+def create_shard(church_id, populate=True):
+    """
+    Create a church's shard file with the full schema. With populate, the church's rows
+    (the church itself, services, users without passwords, eligibility and roster) are
+    copied in from the directory database; a church the directory does not know raises
+    LookupError rather than leaving an empty shard behind.
+
+    The file is built under a unique temporary name and linked into place, so a
+    half-filled shard is never served and a shard is never replaced under open
+    connections: threads of one process take turns, and when another process links
+    its copy first, that copy is kept.
+    """
+    from .sharding import copy_church_rows
+
+    shard_dir = current_app.config['SHARD_DIR']
+    os.makedirs(shard_dir, exist_ok=True)
+    path = shard_path(church_id)
+    with _shard_locks_lock:
+        lock = _shard_locks.setdefault(int(church_id), threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            return  # built by another thread while we waited
+        fd, building = tempfile.mkstemp(dir=shard_dir, prefix=f'church_{int(church_id)}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            shard = _connect(building)
+            try:
+                with current_app.open_resource('schema.sql', mode='r') as f:
+                    shard.executescript(f.read())
+                if populate:
+                    shard.execute('ATTACH DATABASE ? AS src', (os.path.abspath(_directory_path()),))
+                    if not shard.execute('SELECT 1 FROM src.churches WHERE id = ?', (church_id,)).fetchone():
+                        raise LookupError(f'Church {church_id} is not in the directory database')
+                    copy_church_rows(shard, church_id)
+                    shard.commit()
+                    shard.execute('DETACH DATABASE src')
+                shard.commit()
+            finally:
+                shard.close()
+            try:
+                os.link(building, path)
+            except FileExistsError:
+                pass  # another worker process got there first
+        finally:
+            os.remove(building)
+
+def remove_shards():
+    """Delete every shard file (and its archive and journal files) in SHARD_DIR."""
+    for path in glob.glob(os.path.join(current_app.config['SHARD_DIR'], 'church_*')):
+        os.remove(path)
+
+def sync_shard_users(church_id):
+    """
+    Copy a church's users from the directory into its shard so roster joins keep
+    working. Passwords stay in the directory only. No-op unless sharding is on.
+    """
+    if not current_app.config.get('DB_SHARDING'):
+        return
+    use_church(church_id)
+    rows = get_directory_db().execute(
+        'SELECT id, name, email, role, church_id FROM users WHERE church_id = ?', (church_id,)
+    ).fetchall()
+    shard = get_db()
+    shard.execute('DELETE FROM users WHERE church_id = ?', (church_id,))
+    shard.executemany(
+        "INSERT INTO users (id, name, email, password, role, church_id) VALUES (?, ?, ?, '', ?, ?)",
+        [tuple(row) for row in rows]
+    )
+    shard.commit()
+
 def query_db(query, args=(), one=False):
     """Helper for parameterized SQL queries, avoiding manual DB repetition."""
-    cur = get_db().execute(query, args)
-    rv = cur.fetchall()
-    cur.close()
+    rv = get_db().fetch_all(query, args)
     return (rv[0] if rv else None) if one else rv
 
 def init_db():
+    """
+    Drop and recreate every table. With sharding on this resets the directory, and the
+    shard files are deleted too: church ids start again at 1, so old shards would
+    otherwise be served to the new churches.
+    """
     with current_app.app_context():
+        if current_app.config.get('DB_SHARDING'):
+            remove_shards()
         db = get_db()
         with current_app.open_resource('schema.sql', mode='r') as f:
             db.executescript(f.read())
         db.commit()
 
 def close_db(e=None):
-    """Close the database connection."""
-    db = g.pop('_database', None)
-    if db is not None:
-        db.close()
+    """Close the database connections."""
+    for name in ('_database', '_directory_database'):
+        db = g.pop(name, None)
+        if db is not None:
+            db.close()
 
 def init_app(app):
     """Register database functions with the Flask app."""
-    app.teardown_appcontext(close_db) 
\ No newline at end of file
+    app.config.setdefault('DB_SHARDING', os.environ.get('DB_SHARDING', '') not in ('', '0', 'false'))
+    app.config.setdefault('SHARD_DIR', os.environ.get('SHARD_DIR', 'shards'))
+    app.config.setdefault('DIRECTORY_DATABASE', os.environ.get('DIRECTORY_DATABASE'))
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import sqlite3
+import sys
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from .db import add_query_hook
+
+logger = logging.getLogger('duty_roster_app.sql')
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(_PACKAGE_DIR))
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_trackers = []
+
+
+class NPlusOneWarning(UserWarning):
+    """The same statement ran more times in one request than N_PLUS_ONE_THRESHOLD allows."""
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so repeated lookups with different values match."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(?...)', sql)
+
+
+def _call_site():
+    """File and line of the first caller outside the database package."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_PACKAGE_DIR):
+            return f'{os.path.relpath(filename, _SOURCE_ROOT)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class QueryRecord:
+    __slots__ = ('sql', 'normalized', 'params', 'elapsed', 'call_site')
+
+    def __init__(self, sql, params, elapsed, call_site):
+        self.sql = sql
+        self.normalized = normalize_sql(sql)
+        self.params = params
+        self.elapsed = elapsed
+        self.call_site = call_site
+
+
+class QueryLog:
+    """Statements seen during a request or a track_queries() block."""
+
+    def __init__(self):
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def total_time(self):
+        return sum(r.elapsed for r in self.records)
+
+    def repeated(self, threshold):
+        """[(normalized_sql, count, call_sites)] for statements run more than threshold times."""
+        counts = Counter(r.normalized for r in self.records)
+        result = []
+        for sql, count in counts.most_common():
+            if count <= threshold:
+                break
+            sites = sorted({r.call_site for r in self.records if r.normalized == sql})
+            result.append((sql, count, sites))
+        return result
+
+    def assert_no_repeats(self, threshold=None):
+        """Fail if any statement ran more than threshold times (for use in tests)."""
+        if threshold is None:
+            threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+        offenders = self.repeated(threshold)
+        if offenders:
+            details = '\n'.join(f'  {count}x {sql}  (from {", ".join(sites)})'
+                                for sql, count, sites in offenders)
+            raise AssertionError(f'Statements repeated more than {threshold} times:\n{details}')
+
+    def assert_max_queries(self, limit):
+        """Fail if more than limit statements were executed."""
+        if len(self.records) > limit:
+            raise AssertionError(f'Expected at most {limit} queries, got {len(self.records)}')
+
+
+@contextmanager
+def track_queries():
+    """
+    Collect every statement run inside the block, whether or not SQL_PROFILE is on:
+
+        with track_queries() as log:
+            client.post('/admin/generate_roster', data=...)
+        log.assert_no_repeats(10)
+    """
+    log = QueryLog()
+    _trackers.append(log)
+    try:
+        yield log
+    finally:
+        _trackers.remove(log)
+
+
+def explain(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    try:
+        # Call the base class so the EXPLAIN itself isn't reported to the hooks.
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    return [row[3] for row in rows]
+
+
+def _record_query(conn, sql, params, elapsed):
+    profiling = has_app_context() and current_app.config.get('SQL_PROFILE')
+    if not profiling and not _trackers:
+        return
+
+    record = QueryRecord(sql, params, elapsed, _call_site())
+    for log in _trackers:
+        log.records.append(record)
+    if not profiling:
+        return
+
+    if 'sql_query_log' not in g:
+        g.sql_query_log = QueryLog()
+    g.sql_query_log.records.append(record)
+
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        plan = explain(conn, sql, params)
+        logger.warning('Slow query (%.1f ms) at %s: %s\n  plan: %s',
+                       elapsed * 1000, record.call_site, record.normalized,
+                       '; '.join(plan) or 'n/a')
+
+
+def _check_request(response):
+    log = g.get('sql_query_log')
+    if log is None:
+        return response
+    offenders = log.repeated(current_app.config['N_PLUS_ONE_THRESHOLD'])
+    g.sql_repeated_queries = offenders
+    for sql, count, sites in offenders:
+        message = (f'Possible N+1 in {request.endpoint}: {count}x {sql} '
+                   f'(from {", ".join(sites)})')
+        logger.warning(message)
+        if current_app.debug:
+            warnings.warn(message, NPlusOneWarning, stacklevel=2)
+    return response
+
+
+def init_app(app):
+    """
+    Optional statement profiling, enabled with SQL_PROFILE=1. Every statement is logged
+    per request with its timing and call site; statements slower than SLOW_QUERY_MS are
+    logged with their query plan, and a request that repeats one statement more than
+    N_PLUS_ONE_THRESHOLD times is flagged.
+    """
+    app.config.setdefault('SQL_PROFILE', os.environ.get('SQL_PROFILE', '') not in ('', '0', 'false'))
+    app.config.setdefault('SLOW_QUERY_MS', float(os.environ.get('SLOW_QUERY_MS', 100)))
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)))
+    add_query_hook(_record_query)
+    app.after_request(_check_request)
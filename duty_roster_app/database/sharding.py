@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from .db import create_shard, shard_path
+from ..utils.archive import ROSTER_COLUMNS
+from ..utils.duty_load import backfill_duty_load
+
+# (table, rows belonging to one church) copied into that church's shard, in dependency order.
+SHARD_TABLES = [
+    ('churches', 'id = :church_id'),
+    ('worship_services', 'church_id = :church_id'),
+    ('users', 'church_id = :church_id'),
+    ('activity_eligibility', 'church_id = :church_id'),
+    ('duty_roster', 'church_id = :church_id'),
+    ('substitution_requests', 'duty_id IN (SELECT id FROM src.duty_roster WHERE church_id = :church_id)'),
+    ('duty_load', 'church_id = :church_id'),
+    ('duty_roster_archive', 'church_id = :church_id'),
+    ('substitution_requests_archive',
+     'duty_id IN (SELECT id FROM src.duty_roster_archive WHERE church_id = :church_id)'),
+    ('roster_versions', 'church_id = :church_id'),
+    ('feed_token_salts', 'user_id IN (SELECT id FROM src.users WHERE church_id = :church_id)'),
+]
+
+# Tables that stay in the directory database after a prune.
+DIRECTORY_TABLES = ('churches', 'users')
+
+
+def copy_church_rows(shard, church_id):
+    """
+    Copy one church's rows from the database attached as `src` into `shard`. Credentials
+    are blanked; they live only in the directory. When the source predates the duty_load
+    rollup, it is counted from the copied duties instead. Returns the number of rows copied.
+    """
+    source_tables = {row[0] for row in shard.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+    copied = 0
+    for table, where in SHARD_TABLES:
+        if table not in source_tables:
+            continue  # added to the schema after this database was created
+        cur = shard.execute(f'INSERT INTO main.{table} SELECT * FROM src.{table} WHERE {where}',
+                            {'church_id': church_id})
+        copied += cur.rowcount
+    if 'duty_load' not in source_tables:
+        backfill_duty_load(shard, f'(SELECT {ROSTER_COLUMNS} FROM main.duty_roster '
+                                  f'UNION ALL SELECT {ROSTER_COLUMNS} FROM main.duty_roster_archive)', church_id)
+    shard.execute("UPDATE users SET password = ''")
+    return copied
+
+
+def split_database(source_path, church_ids=None, overwrite=False, prune=False):
+    """
+    Copy each church's rows from a single shared database into its own shard file.
+    The source keeps users and churches and becomes the directory database; with
+    prune, the copied per-church rows are deleted from it afterwards.
+
+    :return: list of (church_id, shard path, rows copied).
+    """
+    source = sqlite3.connect(source_path)
+    try:
+        source_tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if church_ids is None:
+            church_ids = [row[0] for row in source.execute('SELECT id FROM churches ORDER BY id')]
+
+        results = []
+        for church_id in church_ids:
+            path = shard_path(church_id)
+            if os.path.exists(path):
+                if not overwrite:
+                    raise FileExistsError(f'Shard already exists: {path}')
+                os.remove(path)
+            create_shard(church_id, populate=False)
+
+            shard = sqlite3.connect(path)
+            try:
+                shard.execute('ATTACH DATABASE ? AS src', (os.path.abspath(source_path),))
+                copied = copy_church_rows(shard, church_id)
+                shard.commit()
+                shard.execute('DETACH DATABASE src')
+            finally:
+                shard.close()
+            results.append((church_id, path, copied))
+
+            if prune:
+                for table, where in reversed(SHARD_TABLES):
+                    if table not in DIRECTORY_TABLES and table in source_tables:
+                        source.execute(f'DELETE FROM {table} WHERE {where.replace("src.", "")}',
+                                       {'church_id': church_id})
+                source.commit()
+        return results
+    finally:
+        source.close()
@@ -1,7 +1,8 @@
-from flask import Blueprint, session, redirect, url_for, request, flash, render_template
+from flask import Blueprint, session, redirect, url_for, request, flash, render_template, abort, Response
 import datetime
 from ..database.db import get_db, query_db
 from ..auth.routes import login_required
+from ..utils.calendar_feed import feed_token, get_feed, load_feed_token, revoke_feed_token
 
 bp = Blueprint('member', __name__)
 
@@ -19,7 +20,34 @@ def dashboard():
            ORDER BY duty_date''',
         [user_id, church_id, today]
     )
-    return render_template('member_dashboard.html', assignments=assignments)
+    calendar_url = url_for('member.calendar_feed', token=feed_token(user_id, church_id), _external=True)
+    return render_template('member_dashboard.html', assignments=assignments, calendar_url=calendar_url)
+
+@bp.route('/calendar/<token>.ics')
+def calendar_feed(token):
+    """
+    iCalendar subscription feed of a member's upcoming duties, authenticated by the
+    signed token in the URL. Calendar apps poll this often, so it is served from a
+    cached render and answers conditional requests with 304.
+    """
+    ids = load_feed_token(token)
+    if ids is None:
+        abort(404)
+    feed = get_feed(*ids)
+    response = Response(feed['body'], mimetype='text/calendar')
+    response.set_etag(feed['etag'])
+    response.last_modified = feed['last_modified']
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@bp.route('/calendar/reset', methods=['POST'])
+@login_required
+def reset_calendar_feed():
+    """Issue a new calendar URL; the old one stops working."""
+    revoke_feed_token(session.get('user_id'), session.get('church_id'))
+    flash('Your calendar link was reset. Update the subscription in your calendar app.')
+    return redirect(url_for('member.dashboard'))
 
 @bp.route('/request_substitution/<int:duty_id>', methods=['GET', 'POST'])
 @login_required
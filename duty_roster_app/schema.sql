@@ -1,3 +1,8 @@
+DROP TABLE IF EXISTS feed_token_salts;
+DROP TABLE IF EXISTS roster_versions;
+DROP TABLE IF EXISTS duty_load;
+DROP TABLE IF EXISTS substitution_requests_archive;
+DROP TABLE IF EXISTS duty_roster_archive;
 DROP TABLE IF EXISTS substitution_requests;
 DROP TABLE IF EXISTS duty_roster;
 DROP TABLE IF EXISTS activity_eligibility;
@@ -30,6 +35,9 @@ CREATE TABLE users (
     FOREIGN KEY(church_id) REFERENCES churches(id)
 );
 
+-- Case-insensitive duplicate checks during member imports.
+CREATE INDEX idx_users_email_lower ON users (lower(email));
+
 CREATE TABLE activity_eligibility (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     church_id INTEGER NOT NULL,
@@ -61,3 +69,45 @@ CREATE TABLE substitution_requests (
     FOREIGN KEY(requester_id) REFERENCES users(id),
     FOREIGN KEY(requested_substitute_id) REFERENCES users(id)
 );
+
+-- Duties per member, activity and month ('YYYY-MM'), maintained alongside duty_roster.
+CREATE TABLE duty_load (
+    church_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    duty_count INTEGER NOT NULL,
+    PRIMARY KEY (church_id, month, user_id, activity)
+) WITHOUT ROWID;
+
+-- Roster history moved out of the hot tables by `flask archive-history`.
+CREATE TABLE duty_roster_archive (
+    id INTEGER NOT NULL,
+    church_id INTEGER NOT NULL,
+    duty_date TEXT NOT NULL,
+    activity TEXT,
+    user_id INTEGER,
+    PRIMARY KEY (church_id, duty_date, id)
+) WITHOUT ROWID;
+
+CREATE TABLE substitution_requests_archive (
+    id INTEGER PRIMARY KEY,
+    duty_id INTEGER,
+    requester_id INTEGER,
+    requested_substitute_id INTEGER,
+    status TEXT,
+    message TEXT
+);
+
+-- Calendar feeds: a version bumped on every roster or service change (feed ETags are
+-- derived from it) and a per-member salt mixed into feed tokens, replaced to revoke them.
+CREATE TABLE roster_versions (
+    church_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE feed_token_salts (
+    user_id INTEGER PRIMARY KEY,
+    salt TEXT NOT NULL
+);
@@ -1,7 +1,6 @@
 # utils/ai.py
 import os
 import json
-import google.generativeai as genai
 import datetime
 import pathlib
 
@@ -34,6 +33,10 @@ def generate_gemini_message(user_instruction: str, existing_services: list) -> l
     :return: A list of new/modified service dicts from the AI.
     """
 
+    # Imported here rather than at module level: the Gemini SDK pulls in gRPC and
+    # protobuf, which would otherwise slow down every app start.
+    import google.generativeai as genai
+
     api_key = os.environ.get("GEMINI_API_KEY", "")
     if not api_key:
         print("Warning: GEMINI_API_KEY not set in environment.")
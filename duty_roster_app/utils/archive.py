@@ -0,0 +1,122 @@
+# utils/archive.py
+import datetime
+import os
+from flask import current_app
+
+# Archived rows keep their original ids. The roster archive is clustered by church and
+# date, which is how history is read back, and neither table carries foreign keys.
+ARCHIVE_DDL = '''
+CREATE TABLE IF NOT EXISTS {schema}.duty_roster_archive (
+    id INTEGER NOT NULL,
+    church_id INTEGER NOT NULL,
+    duty_date TEXT NOT NULL,
+    activity TEXT,
+    user_id INTEGER,
+    PRIMARY KEY (church_id, duty_date, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {schema}.substitution_requests_archive (
+    id INTEGER PRIMARY KEY,
+    duty_id INTEGER,
+    requester_id INTEGER,
+    requested_substitute_id INTEGER,
+    status TEXT,
+    message TEXT
+);
+'''
+
+ROSTER_COLUMNS = 'id, church_id, duty_date, activity, user_id'
+REQUEST_COLUMNS = 'id, duty_id, requester_id, requested_substitute_id, status, message'
+
+
+def default_cutoff():
+    """Duties before this date are archived: today minus ARCHIVE_AFTER_DAYS."""
+    return datetime.date.today() - datetime.timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+
+
+def archive_path(db):
+    """Sibling file for a database's archive: duty_roster.db -> duty_roster.archive.db."""
+    main = next(row[2] for row in db.execute('PRAGMA database_list') if row[1] == 'main')
+    root, ext = os.path.splitext(main)
+    return f'{root}.archive{ext or ".db"}'
+
+
+def attach_archive(db):
+    """
+    Make the archive tables available on this connection and return the schema that holds
+    them: 'main', or 'archive' when ARCHIVE_SEPARATE_FILE is on (the file is attached once
+    per connection). Tables missing from older databases are created.
+    """
+    schema = 'main'
+    if current_app.config['ARCHIVE_SEPARATE_FILE']:
+        schema = 'archive'
+        if not any(row[1] == schema for row in db.execute('PRAGMA database_list')):
+            db.execute('ATTACH DATABASE ? AS archive', (archive_path(db),))
+    if not db.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'duty_roster_archive'").fetchone():
+        # Statement by statement: executescript() would commit the caller's open transaction.
+        for statement in ARCHIVE_DDL.format(schema=schema).split(';'):
+            if statement.strip():
+                db.execute(statement)
+    return schema
+
+
+def roster_history_source(db):
+    """A FROM-clause subquery over current and archived duties, for historical reads."""
+    schema = attach_archive(db)
+    return (f'(SELECT {ROSTER_COLUMNS} FROM duty_roster '
+            f'UNION ALL SELECT {ROSTER_COLUMNS} FROM {schema}.duty_roster_archive)')
+
+
+def has_archived_duties(db, church_id, start, end):
+    """Whether any archived duty falls in [start, end)."""
+    schema = attach_archive(db)
+    return db.execute(f'''SELECT 1 FROM {schema}.duty_roster_archive
+                          WHERE church_id = ? AND duty_date >= ? AND duty_date < ? LIMIT 1''',
+                      (church_id, str(start), str(end))).fetchone() is not None
+
+
+def archive_history(db, cutoff, church_id=None, batch_size=5000):
+    """
+    Move duties dated before `cutoff`, with their substitution requests, out of the hot
+    tables into the archive, batch_size duties per transaction. Rows are copied before
+    they are deleted and the copy replaces by id, so an interrupted run can be repeated.
+    The duty_load rollup is left alone; it keeps counting archived duties.
+
+    :return: (duties moved, substitution requests moved).
+    """
+    schema = attach_archive(db)
+    where, params = 'duty_date < ?', [str(cutoff)]
+    if church_id is not None:
+        where += ' AND church_id = ?'
+        params.append(church_id)
+
+    db.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+    duties = requests = 0
+    try:
+        while True:
+            db.execute('DELETE FROM temp.archive_batch')
+            moved = db.execute(f'INSERT INTO temp.archive_batch SELECT id FROM duty_roster WHERE {where} LIMIT ?',
+                               (*params, batch_size)).rowcount
+            if not moved:
+                break
+            db.execute(f'''INSERT OR REPLACE INTO {schema}.duty_roster_archive ({ROSTER_COLUMNS})
+                           SELECT {ROSTER_COLUMNS} FROM duty_roster
+                           WHERE id IN (SELECT id FROM temp.archive_batch)''')
+            requests += db.execute(f'''INSERT OR REPLACE INTO {schema}.substitution_requests_archive ({REQUEST_COLUMNS})
+                                       SELECT {REQUEST_COLUMNS} FROM substitution_requests
+                                       WHERE duty_id IN (SELECT id FROM temp.archive_batch)''').rowcount
+            db.execute('DELETE FROM substitution_requests WHERE duty_id IN (SELECT id FROM temp.archive_batch)')
+            db.execute('DELETE FROM duty_roster WHERE id IN (SELECT id FROM temp.archive_batch)')
+            db.commit()
+            duties += moved
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.execute('DROP TABLE IF EXISTS temp.archive_batch')
+    return duties, requests
+
+
+def init_app(app):
+    """Set defaults for roster archiving."""
+    app.config.setdefault('ARCHIVE_AFTER_DAYS', int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)))
+    app.config.setdefault('ARCHIVE_SEPARATE_FILE', os.environ.get('ARCHIVE_SEPARATE_FILE', '') not in ('', '0', 'false'))
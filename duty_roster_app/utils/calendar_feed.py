@@ -0,0 +1,207 @@
+# utils/calendar_feed.py
+import datetime
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from ..database.db import get_db, query_db, use_church
+from .scheduler import DAY_TO_WEEKDAY
+
+# Kept with the roster (in the church's shard when sharded), so every worker process
+# reads the same values. roster_versions is bumped on each roster or service change
+# and feed ETags are derived from it; a member's token salt is replaced to revoke
+# their feed URL. Databases that predate the tables get them on first use.
+FEED_DDL = '''
+CREATE TABLE IF NOT EXISTS roster_versions (
+    church_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feed_token_salts (
+    user_id INTEGER PRIMARY KEY,
+    salt TEXT NOT NULL
+);
+'''
+
+# user_id -> {'body', 'etag', 'last_modified'}; a render is reused while its ETag is current.
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def _feed_db(church_id):
+    """The church's roster connection, with the feed tables in place (checked once per connection)."""
+    use_church(church_id)
+    db = get_db()
+    if not getattr(db, '_feed_tables_ready', False):
+        for statement in FEED_DDL.split(';'):
+            if statement.strip():
+                db.execute(statement)
+        db._feed_tables_ready = True
+    return db
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='calendar-feed')
+
+
+def _token_salt(db, user_id):
+    row = db.execute('SELECT salt FROM feed_token_salts WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row else ''
+
+
+def feed_token(user_id, church_id):
+    """
+    Signed token identifying a member's feed. It doesn't expire, as a calendar URL
+    shouldn't, but stops working once revoke_feed_token gives the member a new salt.
+    """
+    data = {'u': user_id, 'c': church_id}
+    salt = _token_salt(_feed_db(church_id), user_id)
+    if salt:  # members who never reset keep the URL they subscribed with
+        data['s'] = salt
+    return _serializer().dumps(data)
+
+
+def load_feed_token(token):
+    """Return (user_id, church_id) for a valid, unrevoked token, or None."""
+    try:
+        data = _serializer().loads(token)
+        user_id, church_id = data['u'], data['c']
+        salt = data.get('s', '')
+    except (BadSignature, KeyError, TypeError, AttributeError):
+        return None
+    if not hmac.compare_digest(str(salt), _token_salt(_feed_db(church_id), user_id)):
+        return None
+    return user_id, church_id
+
+
+def revoke_feed_token(user_id, church_id):
+    """Give a member a new token salt, so feed URLs issued before stop working. Returns the new token."""
+    db = _feed_db(church_id)
+    db.execute('INSERT OR REPLACE INTO feed_token_salts (user_id, salt) VALUES (?, ?)',
+               (user_id, secrets.token_urlsafe(12)))
+    db.commit()
+    with _feeds_lock:
+        _feeds.pop(user_id, None)
+    return feed_token(user_id, church_id)
+
+
+def invalidate_feeds(church_id):
+    """
+    Record a roster or service change for a church, after it is committed. The stored
+    version moves on, so every worker process serves new feeds with a new ETag on the
+    next request.
+    """
+    db = _feed_db(church_id)
+    db.execute(
+        '''INSERT INTO roster_versions (church_id, version, updated_at) VALUES (?, 1, ?)
+           ON CONFLICT (church_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at''',
+        (church_id, datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'))
+    )
+    db.commit()
+
+
+def _escape_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _service_start(duty_date, activity, services):
+    """Start time of the service the duty belongs to, or None if no service matches."""
+    weekday = duty_date.weekday()
+    candidates = []
+    for service in services:
+        if DAY_TO_WEEKDAY.get(service['day'].strip().title()) != weekday:
+            continue
+        try:
+            start = datetime.datetime.strptime(service['time'].strip(), '%I:%M %p').time()
+        except ValueError:
+            continue
+        has_activity = activity in [a.strip() for a in service['activities'].split(',')]
+        candidates.append((not has_activity, start))
+    return min(candidates)[1] if candidates else None
+
+
+def render_feed(user_id, church_id):
+    """Build the iCalendar text for a member's upcoming assignments."""
+    today = datetime.date.today().isoformat()
+    assignments = query_db(
+        '''SELECT id, duty_date, activity FROM duty_roster
+           WHERE user_id = ? AND church_id = ? AND duty_date >= ?
+           ORDER BY duty_date''',
+        [user_id, church_id, today]
+    )
+    services = query_db('SELECT day, time, activities FROM worship_services WHERE church_id = ?', [church_id])
+
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Duty Roster//Member Feed//EN',
+             'CALSCALE:GREGORIAN', 'X-WR-CALNAME:Duty Roster']
+    for duty in assignments:
+        duty_date = datetime.date.fromisoformat(duty['duty_date'])
+        start = _service_start(duty_date, duty['activity'], services)
+        lines += ['BEGIN:VEVENT', f"UID:roster-{duty['id']}@duty-roster",
+                  # DTSTAMP is tied to the duty rather than the render time so unchanged
+                  # feeds keep the same bytes, and therefore the same ETag.
+                  f"DTSTAMP:{duty_date.strftime('%Y%m%d')}T000000Z"]
+        if start is None:
+            lines += [f"DTSTART;VALUE=DATE:{duty_date.strftime('%Y%m%d')}",
+                      f"DTEND;VALUE=DATE:{(duty_date + datetime.timedelta(days=1)).strftime('%Y%m%d')}"]
+        else:
+            begin = datetime.datetime.combine(duty_date, start)
+            lines += [f"DTSTART:{begin.strftime('%Y%m%dT%H%M%S')}",
+                      f"DTEND:{(begin + datetime.timedelta(hours=1)).strftime('%Y%m%dT%H%M%S')}"]
+        lines += [f"SUMMARY:{_escape_text(duty['activity'])}", 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def get_feed(user_id, church_id):
+    """
+    Return the feed entry for a member. The ETag comes from the church's stored roster
+    version and today's date (past duties drop out of the feed overnight), so it is the
+    same in every worker process and changes as soon as invalidate_feeds is called
+    anywhere. The rendered body is cached per process and reused while the ETag holds.
+    """
+    db = _feed_db(church_id)
+    row = db.execute('SELECT version, updated_at FROM roster_versions WHERE church_id = ?',
+                     (church_id,)).fetchone()
+    version, updated_at = (row['version'], row['updated_at']) if row else (0, None)
+    today = datetime.date.today()
+    etag = hashlib.sha256(f'{user_id}:{church_id}:{version}:{today}'.encode('utf-8')).hexdigest()[:32]
+    with _feeds_lock:
+        entry = _feeds.get(user_id)
+    if entry and entry['etag'] == etag:
+        return entry
+
+    last_modified = datetime.datetime.combine(today, datetime.time(), datetime.timezone.utc)
+    if updated_at:
+        last_modified = max(last_modified, datetime.datetime.fromisoformat(updated_at))
+    entry = {'body': render_feed(user_id, church_id), 'etag': etag, 'last_modified': last_modified}
+    with _feeds_lock:
+        _feeds.pop(user_id, None)
+        _feeds[user_id] = entry
+        while len(_feeds) > current_app.config['CALENDAR_FEED_CACHE_SIZE']:
+            del _feeds[next(iter(_feeds))]
+    return entry
+
+
+def init_app(app):
+    """Set defaults for the calendar feed cache."""
+    app.config.setdefault('CALENDAR_FEED_CACHE_SIZE', int(os.environ.get('CALENDAR_FEED_CACHE_SIZE', 10000)))
@@ -0,0 +1,146 @@
+# utils/duty_load.py
+from collections import Counter
+from .archive import roster_history_source
+
+# Kept in step with duty_roster by the code paths that write it. Databases that predate
+# the table get it, backfilled from the roster, the first time it is used;
+# `flask rebuild-duty-load` recomputes it from scratch.
+DUTY_LOAD_DDL = '''
+CREATE TABLE IF NOT EXISTS duty_load (
+    church_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    duty_count INTEGER NOT NULL,
+    PRIMARY KEY (church_id, month, user_id, activity)
+) WITHOUT ROWID
+'''
+
+UPSERT = '''
+    INSERT INTO duty_load (church_id, month, user_id, activity, duty_count) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (church_id, month, user_id, activity) DO UPDATE SET duty_count = duty_count + excluded.duty_count
+'''
+
+
+BACKFILL = '''
+    INSERT INTO duty_load (church_id, month, user_id, activity, duty_count)
+    SELECT church_id, substr(duty_date, 1, 7), user_id, activity, COUNT(*)
+    FROM {history} {scope} AND user_id IS NOT NULL GROUP BY 1, 2, 3, 4
+'''
+
+
+def backfill_duty_load(db, history, church_id=None):
+    """Count the duties in `history` (a FROM-clause over roster rows) into the rollup, for one church or all."""
+    scope, params = ('WHERE church_id = ?', (church_id,)) if church_id is not None else ('WHERE 1', ())
+    db.execute(BACKFILL.format(history=history, scope=scope), params)
+
+
+def ensure_duty_load(db):
+    """
+    Create the rollup and fill it from current and archived duties if this database
+    predates it. Runs before the roster is changed, so the backfill sees the rows the
+    following delta applies to. Checked once per connection.
+    """
+    if getattr(db, '_duty_load_ready', False):
+        return
+    if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'duty_load'").fetchone():
+        history = roster_history_source(db)  # may attach the archive, which needs no open transaction
+        started = not db.in_transaction
+        if started:
+            db.execute('BEGIN IMMEDIATE')
+        # Another worker may have created it while we waited for the write lock.
+        if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'duty_load'").fetchone():
+            db.execute(DUTY_LOAD_DDL)
+            backfill_duty_load(db, history)
+        if started:
+            db.commit()
+    db._duty_load_ready = True
+
+
+def _apply(db, church_id, counts):
+    """Add the (month, user_id, activity) -> delta counts to the rollup and drop rows that reach zero."""
+    ensure_duty_load(db)
+    deltas = [(church_id, month, user_id, activity, delta)
+              for (month, user_id, activity), delta in counts.items() if delta]
+    if not deltas:
+        return
+    db.executemany(UPSERT, deltas)
+    emptied = [key for *key, delta in deltas if delta < 0]
+    if emptied:
+        db.executemany('''DELETE FROM duty_load WHERE church_id = ? AND month = ? AND user_id = ?
+                          AND activity = ? AND duty_count <= 0''', emptied)
+
+
+def record_duties(db, church_id, duties, sign=1):
+    """
+    Count duties into (or, with sign=-1, out of) the rollup.
+
+    :param duties: iterable of (duty_date, activity, user_id); dates are ISO strings or dates.
+    """
+    counts = Counter()
+    for duty_date, activity, user_id in duties:
+        counts[(str(duty_date)[:7], user_id, activity)] += sign
+    _apply(db, church_id, counts)
+
+
+def forget_duties(db, church_id, where, params=(), replacements=()):
+    """
+    Subtract the duty_roster rows matching `where` (already scoped to church_id) from the
+    rollup. Call it before deleting those rows, in the same transaction.
+
+    :param replacements: (duty_date, activity, user_id) duties about to be inserted in their
+        place. They are netted against the removed rows, so regenerating a month only
+        writes the counts that actually changed.
+    """
+    rows = db.execute(
+        f'''SELECT substr(duty_date, 1, 7), user_id, activity, COUNT(*) FROM duty_roster
+            WHERE church_id = ? AND ({where}) GROUP BY 1, 2, 3''',
+        (church_id, *params)
+    ).fetchall()
+    counts = Counter({(month, user_id, activity): -count for month, user_id, activity, count in rows})
+    for duty_date, activity, user_id in replacements:
+        counts[(str(duty_date)[:7], user_id, activity)] += 1
+    _apply(db, church_id, counts)
+
+
+def reassign_duty(db, church_id, duty, new_user_id):
+    """Move one duty's count from its current member to new_user_id."""
+    if duty['user_id'] == new_user_id:
+        return
+    month = duty['duty_date'][:7]
+    _apply(db, church_id, Counter({(month, duty['user_id'], duty['activity']): -1,
+                                   (month, new_user_id, duty['activity']): 1}))
+
+
+def rebuild_duty_load(db, church_id=None):
+    """
+    Recompute the rollup from current and archived duties for one church, or all of them.
+    The caller commits.
+    """
+    history = roster_history_source(db)
+    db.execute(DUTY_LOAD_DDL)
+    scope, params = ('WHERE church_id = ?', (church_id,)) if church_id is not None else ('WHERE 1', ())
+    db.execute(f'DELETE FROM duty_load {scope}', params)
+    backfill_duty_load(db, history, church_id)
+    return db.execute(f'SELECT COUNT(*) FROM duty_load {scope}', params).fetchone()[0]
+
+
+def duty_load_totals(db, church_id, start_month, end_month, activity=None):
+    """
+    Duties per member and activity for months start_month..end_month ('YYYY-MM',
+    inclusive), read from the rollup only, so the cost depends on the number of
+    members, activities and months, not on how much roster history there is.
+
+    :return: dict of user_id -> {activity: count}.
+    """
+    ensure_duty_load(db)
+    sql = '''SELECT user_id, activity, SUM(duty_count) FROM duty_load
+             WHERE church_id = ? AND month >= ? AND month <= ?'''
+    params = [church_id, start_month, end_month]
+    if activity:
+        sql += ' AND activity = ?'
+        params.append(activity)
+    totals = {}
+    for user_id, act, count in db.execute(sql + ' GROUP BY user_id, activity', params):
+        totals.setdefault(user_id, {})[act] = count
+    return totals
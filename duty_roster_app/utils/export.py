@@ -0,0 +1,187 @@
+# utils/export.py
+import csv
+import io
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from ..database.db import get_db
+from .archive import roster_history_source
+
+EXPORT_COLUMNS = ['duty_date', 'day', 'service_times', 'activity', 'member_name', 'member_email', 'roster_id']
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Services are matched to a duty by weekday, the same way the roster page groups them.
+# {roster} is duty_roster, or a subquery that adds archived history.
+EXPORT_QUERY = '''
+    SELECT dr.duty_date,
+           CASE strftime('%w', dr.duty_date)
+               WHEN '0' THEN 'Sunday' WHEN '1' THEN 'Monday' WHEN '2' THEN 'Tuesday'
+               WHEN '3' THEN 'Wednesday' WHEN '4' THEN 'Thursday' WHEN '5' THEN 'Friday'
+               ELSE 'Saturday' END AS day,
+           (SELECT group_concat(TRIM(ws.time), '; ') FROM worship_services ws
+             WHERE ws.church_id = dr.church_id
+               AND TRIM(ws.day) = CASE strftime('%w', dr.duty_date)
+                   WHEN '0' THEN 'Sunday' WHEN '1' THEN 'Monday' WHEN '2' THEN 'Tuesday'
+                   WHEN '3' THEN 'Wednesday' WHEN '4' THEN 'Thursday' WHEN '5' THEN 'Friday'
+                   ELSE 'Saturday' END COLLATE NOCASE) AS service_times,
+           dr.activity,
+           u.name AS member_name,
+           u.email AS member_email,
+           dr.id AS roster_id
+    FROM {roster} dr
+    JOIN users u ON dr.user_id = u.id
+    WHERE dr.church_id = ? AND dr.duty_date >= ? AND dr.duty_date < ?
+    ORDER BY dr.duty_date, dr.activity
+'''
+
+FETCH_SIZE = 500
+
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iter_roster_rows(church_id, start, end, include_archive=False):
+    """
+    Yield export rows FETCH_SIZE at a time. The rows are first copied, in order, into a
+    temp table private to this connection by a single statement. Pages are then read
+    from that copy, so no read on the shared database stays open while a slow client
+    downloads. Such a read would hold a SHARED lock and block every writer. The export
+    is also a consistent snapshot. The connection is opened on first iteration, so run
+    this inside stream_with_context(). With include_archive, archived duties are
+    included too.
+    """
+    db = get_db()
+    roster = roster_history_source(db) if include_archive else 'duty_roster'
+    db.execute('DROP TABLE IF EXISTS temp.export_rows')
+    db.execute(f'CREATE TEMP TABLE export_rows AS {EXPORT_QUERY.format(roster=roster)}', (church_id, start, end))
+    try:
+        sent = 0
+        while True:
+            # Rows were inserted in export order, so rowids run 1..n.
+            rows = db.fetch_all('SELECT * FROM temp.export_rows WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                                (sent, FETCH_SIZE))
+            yield from rows
+            if len(rows) < FETCH_SIZE:
+                break
+            sent += len(rows)
+    finally:
+        db.execute('DROP TABLE IF EXISTS temp.export_rows')
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(tuple(row))
+        if count % FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_jsonl(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+        if len(chunk) >= FETCH_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file object that collects written bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Roster" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = _XML_INVALID.sub('', '' if value is None else str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def stream_xlsx(rows):
+    """
+    Write a minimal single-sheet workbook as a zip stream. The zip is written without
+    seeking (sizes go in data descriptors), so each chunk can be sent as soon as it
+    is compressed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_PARTS.items():
+            zf.writestr(name, content)
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>')
+            sheet.write(_xlsx_row(EXPORT_COLUMNS).encode())
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(tuple(row)).encode())
+                if count % FETCH_SIZE == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+STREAMERS = {'csv': stream_csv, 'jsonl': stream_jsonl, 'xlsx': stream_xlsx}
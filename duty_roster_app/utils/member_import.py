@@ -0,0 +1,238 @@
+# utils/member_import.py
+import concurrent.futures
+import csv
+import io
+import json
+import os
+import time
+from functools import partial
+from werkzeug.security import generate_password_hash
+from .passwords import PasswordPoolBusy
+
+VALID_ROLES = ('member', 'admin')
+
+# Below this many passwords per batch the pool start-up cost outweighs the gain.
+MIN_PARALLEL_HASHES = 8
+
+# In schema.sql; created here too for databases that predate it.
+EMAIL_INDEX_DDL = 'CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email))'
+
+
+class ImportReport:
+    """Outcome of a member import: counts, per-row errors and throughput."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        self.errors = []  # list of (row_number, message)
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"Imported {self.inserted} of {self.rows_read} rows "
+                f"({len(self.errors)} errors) in {self.elapsed:.2f}s "
+                f"({self.rows_per_second:.0f} rows/s)")
+
+    def to_dict(self):
+        return {
+            'rows_read': self.rows_read,
+            'inserted': self.inserted,
+            'errors': [{'row': row, 'error': msg} for row, msg in self.errors],
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class ImportAborted(Exception):
+    """
+    The import stopped partway: the file could not be decoded or parsed to the end, or
+    the password pool stayed busy. `report` covers the batches committed before that.
+    """
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def detect_format(filename):
+    """Guess the import format from a file name ('csv', 'jsonl' or 'json')."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.json':
+        return 'json'
+    return 'csv'
+
+
+def iter_member_rows(stream, fmt='csv'):
+    """
+    Yield (row_number, dict) pairs from a text stream without reading it all up front.
+    CSV needs a header row (name, email and optionally password, role). JSON Lines is
+    one object per line. A plain JSON array has to be parsed whole, so prefer CSV or
+    JSON Lines for very large files.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row_number, row in enumerate(reader, start=2):  # row 1 is the header
+            yield row_number, row
+    elif fmt == 'jsonl':
+        for row_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e.msg}")
+    elif fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be a list of member objects")
+        for row_number, row in enumerate(data, start=1):
+            yield row_number, row
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _text(row, key):
+    """A field as a string ('' if absent); JSON numbers, lists etc. are rejected."""
+    value = row.get(key)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"Field {key!r} must be text, not {type(value).__name__}")
+    return value
+
+
+def _clean_row(row, default_password):
+    """Validate one input row; return (name, email, password, role) or raise ValueError."""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    name = _text(row, 'name').strip()
+    email = _text(row, 'email').strip().lower()
+    password = _text(row, 'password') or default_password
+    role = (_text(row, 'role') or 'member').strip().lower()
+    if not name:
+        raise ValueError("Missing name")
+    if not email or '@' not in email:
+        raise ValueError(f"Invalid email: {email!r}")
+    if not password:
+        raise ValueError("Missing password and no default password given")
+    if role not in VALID_ROLES:
+        raise ValueError(f"Invalid role: {role!r}")
+    return name, email, password, role
+
+
+def _existing_emails(db, emails):
+    """
+    Return the subset of (lowercase) emails already present in the users table, in any
+    case. Uses the lower(email) index (EMAIL_INDEX_DDL).
+    """
+    if not emails:
+        return set()
+    placeholders = ','.join('?' * len(emails))
+    rows = db.execute(f'SELECT lower(email) FROM users WHERE lower(email) IN ({placeholders})',
+                      list(emails)).fetchall()
+    return {row[0] for row in rows}
+
+
+def _hash_all(passwords, pool, workers, method):
+    hasher = partial(generate_password_hash, method=method)
+    if pool is None or len(passwords) < MIN_PARALLEL_HASHES:
+        return [hasher(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(hasher, passwords, chunksize=chunksize))
+
+
+def import_members(db, church_id, rows, default_password=None, batch_size=500, workers=None,
+                   method='scrypt', hash_many=None):
+    """
+    Import members into a church from an iterable of (row_number, row) pairs.
+
+    Rows are validated and de-duplicated by email (within the input and against the
+    users table) before any hashing happens. Passwords are hashed with `method` across a process pool
+    and each batch is inserted with executemany and committed as one transaction, so a
+    bad row is reported instead of aborting the whole import. An unreadable file or a
+    busy pool raises ImportAborted, whose report says what was imported before it.
+
+    :param hash_many: callable hashing a list of passwords, e.g. passwords.hash_passwords
+        to share the app's bounded pool. Without it a pool of `workers` processes is
+        started for this import, which suits the command line.
+    """
+    report = ImportReport()
+    seen = set()
+    db.execute(EMAIL_INDEX_DDL)
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if hash_many is None and workers > 1:
+        # concurrent.futures loads the multiprocessing machinery on first attribute access.
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    def flush(batch):
+        emails = {email for _, (_, email, _, _) in batch}
+        taken = _existing_emails(db, emails)
+        pending = []
+        for row_number, values in batch:
+            if values[1] in taken:
+                report.add_error(row_number, f"Email already registered: {values[1]}")
+            else:
+                pending.append((row_number, values))
+        if not pending:
+            return
+        passwords = [values[2] for _, values in pending]
+        hashes = hash_many(passwords) if hash_many else _hash_all(passwords, pool, workers, method)
+        params = [(name, email, hashed, role, church_id)
+                  for (_, (name, email, _, role)), hashed in zip(pending, hashes)]
+        try:
+            db.executemany(
+                'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
+                params
+            )
+            db.commit()
+            report.inserted += len(params)
+        except Exception as e:
+            db.rollback()
+            for row_number, _ in pending:
+                report.add_error(row_number, f"Batch insert failed: {e}")
+
+    try:
+        batch = []
+        for row_number, row in rows:
+            report.rows_read += 1
+            try:
+                values = _clean_row(row, default_password)
+            except ValueError as e:
+                report.add_error(row_number, str(e))
+                continue
+            if values[1] in seen:
+                report.add_error(row_number, f"Duplicate email in input: {values[1]}")
+                continue
+            seen.add(values[1])
+            batch.append((row_number, values))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    except (ValueError, csv.Error, PasswordPoolBusy) as e:
+        raise ImportAborted(str(e) or 'password hashing is busy, try again later', report) from e
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        report.elapsed = time.perf_counter() - start
+        report.errors.sort()
+    return report
+
+
+def open_text_stream(binary_stream):
+    """Wrap an uploaded (binary) file so the import can stream it as text."""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
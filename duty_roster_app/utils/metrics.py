@@ -0,0 +1,126 @@
+# utils/metrics.py
+import threading
+import time
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from ..database.db import add_query_hook
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram with one series per label set."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels in sorted(self._series):
+                series = self._series[labels]
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+                sep = ',' if base else ''
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{base}}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{base}}} {series["count"]}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_latency = Histogram(
+    'duty_roster_request_duration_seconds', 'Time spent handling a request.',
+    ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+request_sql_queries = Histogram(
+    'duty_roster_request_sql_queries', 'SQL statements executed per request.',
+    ('endpoint',), QUERY_COUNT_BUCKETS)
+request_sql_time = Histogram(
+    'duty_roster_request_sql_seconds', 'Cumulative SQL time per request.',
+    ('endpoint',), LATENCY_BUCKETS)
+template_render_time = Histogram(
+    'duty_roster_template_render_seconds', 'Time spent rendering a template.',
+    ('template',), LATENCY_BUCKETS)
+
+ALL_METRICS = (request_latency, request_sql_queries, request_sql_time, template_render_time)
+
+
+def render_prometheus():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in ALL_METRICS:
+        metric.reset()
+
+
+def _record_query(conn, sql, params, elapsed):
+    if has_app_context() and 'metrics_sql_count' in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += elapsed
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_sql_count = 0
+    g.metrics_sql_time = 0.0
+
+
+def _finish_request(response):
+    if 'metrics_start' in g:
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe((endpoint, request.method, str(response.status_code)),
+                                time.perf_counter() - g.metrics_start)
+        request_sql_queries.observe((endpoint,), g.metrics_sql_count)
+        request_sql_time.observe((endpoint,), g.metrics_sql_time)
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('metrics_render_starts', []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get('metrics_render_starts')
+    if starts:
+        template_render_time.observe((template.name or 'inline',), time.perf_counter() - starts.pop())
+
+
+def init_app(app):
+    """
+    Time every request, count its SQL statements and template renders. Metrics live in
+    process memory, so each worker process reports its own numbers.
+    """
+    add_query_hook(_record_query)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
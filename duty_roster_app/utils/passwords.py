@@ -0,0 +1,157 @@
+# utils/passwords.py
+import atexit
+import concurrent.futures
+import os
+import threading
+from collections import deque
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+_method_prefixes = {}
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password checks are already queued or running."""
+
+
+def _get_pool():
+    """Create the hashing pool and its admission semaphore on first use, or after the pool broke."""
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                if _slots is None:
+                    # Kept across rebuilds: futures of a broken pool still release their slots.
+                    _slots = threading.BoundedSemaphore(config['PASSWORD_MAX_PENDING'])
+                _pool = concurrent.futures.ProcessPoolExecutor(max_workers=config['PASSWORD_WORKERS'])
+                atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _discard_pool(pool):
+    """
+    Drop a pool whose worker died (BrokenProcessPool); every later submit to it would
+    fail, so the next call builds a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(fn, *args):
+    """
+    Run fn in the hashing pool, rejecting immediately when the queue is full so a
+    burst of logins can't tie up every request thread waiting on CPU-bound hashes.
+    A broken pool is replaced and the call reported as busy, so it can be retried.
+    """
+    pool = _get_pool()
+    if not _slots.acquire(blocking=False):
+        raise PasswordPoolBusy()
+    try:
+        future = pool.submit(fn, *args)
+    except concurrent.futures.BrokenExecutor:
+        _slots.release()
+        _discard_pool(pool)
+        raise PasswordPoolBusy()
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_CHECK_TIMEOUT'])
+    except concurrent.futures.TimeoutError:
+        raise PasswordPoolBusy()
+    except concurrent.futures.BrokenExecutor:
+        _discard_pool(pool)
+        raise PasswordPoolBusy()
+
+
+def hash_password(password):
+    """Hash a password with the configured method (see PASSWORD_HASH_METHOD)."""
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(stored_hash, password):
+    """Check a password against its stored hash in the worker pool."""
+    return _submit(check_password_hash, stored_hash, password)
+
+
+def rehash_password(password):
+    """Hash a password with the configured method in the worker pool."""
+    return _submit(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method=method) for password in passwords]
+
+
+def hash_passwords(passwords, chunk_size=8):
+    """
+    Hash many passwords (a bulk import) in the shared pool. Work goes in small chunks
+    that each take an admission slot, and at most a quarter of the slots are used at
+    once, so login checks keep getting through while an import runs. Unlike a login,
+    an import waits for a free slot, but only for PASSWORD_QUEUE_TIMEOUT seconds;
+    after that, or when a chunk takes longer than PASSWORD_CHECK_TIMEOUT, it raises
+    PasswordPoolBusy.
+    """
+    pool = _get_pool()
+    config = current_app.config
+    window = max(1, config['PASSWORD_MAX_PENDING'] // 4)
+    in_flight = deque()
+    hashes = []
+
+    def collect():
+        try:
+            hashes.extend(in_flight.popleft().result(timeout=config['PASSWORD_CHECK_TIMEOUT']))
+        except concurrent.futures.TimeoutError:
+            raise PasswordPoolBusy()
+        except concurrent.futures.BrokenExecutor:
+            _discard_pool(pool)
+            raise PasswordPoolBusy()
+
+    for start in range(0, len(passwords), chunk_size):
+        if len(in_flight) >= window:
+            collect()
+        if not _slots.acquire(timeout=config['PASSWORD_QUEUE_TIMEOUT']):
+            raise PasswordPoolBusy()
+        try:
+            future = pool.submit(_hash_chunk, passwords[start:start + chunk_size], config['PASSWORD_HASH_METHOD'])
+        except concurrent.futures.BrokenExecutor:
+            _slots.release()
+            _discard_pool(pool)
+            raise PasswordPoolBusy()
+        except Exception:
+            _slots.release()
+            raise
+        future.add_done_callback(lambda _: _slots.release())
+        in_flight.append(future)
+    while in_flight:
+        collect()
+    return hashes
+
+
+def needs_rehash(stored_hash):
+    """True if the stored hash wasn't made with the current method and parameters."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        # werkzeug fills in default parameters, e.g. "scrypt" -> "scrypt:32768:8:1"
+        prefix = _method_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return stored_hash.split('$', 1)[0] != prefix
+
+
+def init_app(app):
+    """Set defaults for the password hashing settings (overridable from .env)."""
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'))
+    workers = os.environ.get('PASSWORD_WORKERS')
+    app.config.setdefault('PASSWORD_WORKERS', int(workers) if workers else None)  # None means one per CPU
+    app.config.setdefault('PASSWORD_MAX_PENDING', int(os.environ.get('PASSWORD_MAX_PENDING', 32)))
+    app.config.setdefault('PASSWORD_CHECK_TIMEOUT', 5.0)
+    # How long a bulk import waits for a free slot before giving up.
+    app.config.setdefault('PASSWORD_QUEUE_TIMEOUT', float(os.environ.get('PASSWORD_QUEUE_TIMEOUT', 10)))
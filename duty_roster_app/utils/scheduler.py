@@ -0,0 +1,67 @@
+# utils/scheduler.py
+import datetime
+
+DAY_TO_WEEKDAY = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+    'Friday': 4, 'Saturday': 5, 'Sunday': 6
+}
+
+
+def month_bounds(year, month):
+    """Return (first day of the month, first day of the next month)."""
+    start_date = datetime.date(year, month, 1)
+    if month == 12:
+        end_date = datetime.date(year + 1, 1, 1)
+    else:
+        end_date = datetime.date(year, month + 1, 1)
+    return start_date, end_date
+
+
+def build_roster(services, members, eligibility, start_date, end_date):
+    """
+    Assign eligible members to every service activity between start_date (inclusive)
+    and end_date (exclusive), round-robin per activity.
+
+    :param services: rows with day, time and comma-separated activities.
+    :param members: member rows (with at least id) in the order they should rotate.
+    :param eligibility: dict of activity -> list of eligible user ids.
+    :return: a list of (date, activity, member, service) tuples, one per assignment.
+             An activity is only filled once per date even if several services list it.
+    """
+    eligible_by_activity = {}
+    activity_member_index = {}
+    assigned = set()
+    assignments = []
+
+    services_by_weekday = {}
+    for service in services:
+        weekday = DAY_TO_WEEKDAY.get(service['day'].strip().title())
+        if weekday is not None:
+            services_by_weekday.setdefault(weekday, []).append(service)
+
+    date_iter = start_date
+    while date_iter < end_date:
+        for service in services_by_weekday.get(date_iter.weekday(), []):
+            activities = dict.fromkeys(act.strip() for act in service['activities'].split(','))
+            for activity in activities:
+                eligible_members = eligible_by_activity.get(activity)
+                if eligible_members is None:
+                    eligible_ids = set(eligibility.get(activity, []))
+                    eligible_members = [m for m in members if m['id'] in eligible_ids]
+                    eligible_by_activity[activity] = eligible_members
+                if not eligible_members:
+                    continue
+
+                index = activity_member_index.get(activity, 0)
+                member = eligible_members[index % len(eligible_members)]
+                activity_member_index[activity] = index + 1
+
+                # The rotation advances even when an earlier service already filled the slot.
+                if (date_iter, activity) in assigned:
+                    continue
+                assigned.add((date_iter, activity))
+                assignments.append((date_iter, activity, member, service))
+
+        date_iter += datetime.timedelta(days=1)
+
+    return assignments
@@ -0,0 +1,204 @@
+# utils/service_batch.py
+import datetime
+from .scheduler import DAY_TO_WEEKDAY
+
+DAY_ORDER = {'Sunday': 0, 'Monday': 1, 'Tuesday': 2, 'Wednesday': 3,
+             'Thursday': 4, 'Friday': 5, 'Saturday': 6}
+
+MAX_OPERATIONS = 500
+
+
+class ServiceBatchError(ValueError):
+    """A batch operation failed validation; nothing was written."""
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+
+def normalize_day(value):
+    day = str(value or '').strip().title()
+    if day not in DAY_TO_WEEKDAY:
+        raise ValueError(f'Unknown day: {value!r}')
+    return day
+
+
+def normalize_time(value):
+    """Parse a time like '10:00 am' or '6:00PM' and return it as '10:00 AM'."""
+    text = str(value or '').strip().upper()
+    for fmt in ('%I:%M %p', '%I:%M%p'):
+        try:
+            parsed = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed.strftime('%I:%M %p').lstrip('0')
+    raise ValueError(f'Invalid time {value!r}, expected e.g. 10:00 AM')
+
+
+def normalize_activities(value):
+    """Accept a list or a comma-separated string; return 'A, B' with blanks and repeats dropped."""
+    items = value if isinstance(value, (list, tuple)) else str(value or '').split(',')
+    activities = []
+    for item in items:
+        item = str(item).strip()
+        if item and item not in activities:
+            activities.append(item)
+    if not activities:
+        raise ValueError('At least one activity is required')
+    return ', '.join(activities)
+
+
+def _or_raw(normalize, value):
+    """Normalize a stored value; rows saved before validation may not parse, so keep those as they are."""
+    try:
+        return normalize(value)
+    except ValueError:
+        return value
+
+
+def _slot(service):
+    """(day, time) a service occupies, so 'sunday' / '6:00pm' clashes with 'Sunday' / '6:00 PM'."""
+    return _or_raw(normalize_day, service['day']), _or_raw(normalize_time, service['time'])
+
+
+def _time_key(value):
+    try:
+        return datetime.datetime.strptime(value.strip(), '%I:%M %p').time()
+    except ValueError:
+        return datetime.time(0, 0)
+
+
+def serialize_services(rows):
+    """Service rows as the JSON list the setup page renders, sorted by day and time."""
+    services = []
+    for row in rows:
+        services.append({
+            'id': row['id'],
+            'day': _or_raw(normalize_day, row['day']),
+            'time': _or_raw(normalize_time, row['time']),
+            'activities': [a.strip() for a in row['activities'].split(',') if a.strip()] if row['activities'] else [],
+        })
+    services.sort(key=lambda s: (DAY_ORDER.get(s['day'].strip(), 7), _time_key(s['time'])))
+    return services
+
+
+def _resolve(op, index, services, refs):
+    """Return the key of the service an update or delete targets: an existing id or an earlier add's ref."""
+    if op.get('ref') is not None and str(op['ref']) in refs:
+        key = refs[str(op['ref'])]
+    elif op.get('id') not in (None, ''):
+        try:
+            key = int(op['id'])
+        except (TypeError, ValueError):
+            raise ServiceBatchError(f'Invalid service id: {op["id"]!r}', index)
+    else:
+        raise ServiceBatchError('Missing service id', index)
+    if key not in services:
+        raise ServiceBatchError(f'Service {op.get("id", op.get("ref"))} does not exist', index)
+    return key
+
+
+def apply_service_batch(db, church_id, operations):
+    """
+    Validate an ordered list of add/update/delete operations against the church's
+    current services, then write the net result in one transaction.
+
+    Each operation is a dict with 'op' plus:
+      add:    day, time, activities, and optionally a client 'ref' later operations can use
+      update: id (or ref) and any of day, time, activities
+      delete: id (or ref)
+
+    Operations are replayed in memory first, so an add that is later updated or
+    deleted in the same batch costs one write or none. Raises ServiceBatchError,
+    with the index of the offending operation, before anything is written.
+
+    :return: dict with the counts written and 'refs', mapping each add's ref to its new id.
+    """
+    if not isinstance(operations, list):
+        raise ServiceBatchError('operations must be a list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ServiceBatchError(f'At most {MAX_OPERATIONS} operations per batch')
+
+    original = {row['id']: {'day': row['day'], 'time': row['time'], 'activities': row['activities']}
+                for row in db.execute('SELECT id, day, time, activities FROM worship_services WHERE church_id = ?',
+                                      (church_id,)).fetchall()}
+    # Existing services are keyed by id, new ones by ('new', position in the batch).
+    services = {key: dict(value) for key, value in original.items()}
+    refs = {}
+    touched = {}  # key -> index of the last operation that set it
+
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            raise ServiceBatchError('Each operation must be an object', index)
+        kind = op.get('op')
+        try:
+            if kind == 'add':
+                key = ('new', index)
+                services[key] = {'day': normalize_day(op.get('day')),
+                                 'time': normalize_time(op.get('time')),
+                                 'activities': normalize_activities(op.get('activities'))}
+                if op.get('ref') is not None:
+                    refs[str(op['ref'])] = key
+                touched[key] = index
+            elif kind == 'update':
+                key = _resolve(op, index, services, refs)
+                service = services[key]
+                if 'day' in op:
+                    service['day'] = normalize_day(op['day'])
+                if 'time' in op:
+                    service['time'] = normalize_time(op['time'])
+                if 'activities' in op:
+                    service['activities'] = normalize_activities(op['activities'])
+                touched[key] = index
+            elif kind == 'delete':
+                key = _resolve(op, index, services, refs)
+                del services[key]
+                touched.pop(key, None)
+            else:
+                raise ServiceBatchError(f'Unknown op: {kind!r}', index)
+        except ValueError as e:
+            if isinstance(e, ServiceBatchError):
+                raise
+            raise ServiceBatchError(str(e), index)
+
+    slots = {}
+    for key, service in services.items():
+        slots.setdefault(_slot(service), []).append(key)
+    for key, index in sorted(touched.items(), key=lambda item: item[1]):
+        day, time = _slot(services[key])
+        if len(slots[(day, time)]) > 1:
+            raise ServiceBatchError(f'More than one service on {day} at {time}', index)
+
+    deletes = [(key, church_id) for key in original if key not in services]
+    updates = [(s['day'], s['time'], s['activities'], key, church_id)
+               for key, s in services.items() if key in original and s != original[key]]
+    inserts = [(church_id, s['day'], s['time'], s['activities'])
+               for key, s in services.items() if key not in original]
+
+    try:
+        if deletes:
+            db.executemany('DELETE FROM worship_services WHERE id = ? AND church_id = ?', deletes)
+        if updates:
+            db.executemany('UPDATE worship_services SET day = ?, time = ?, activities = ? '
+                           'WHERE id = ? AND church_id = ?', updates)
+        if inserts:
+            db.executemany('INSERT INTO worship_services (church_id, day, time, activities) VALUES (?, ?, ?, ?)',
+                           inserts)
+        new_ids = {}
+        if inserts and refs:
+            # Slots are unique after validation, so the new rows can be found by day and time.
+            for row in db.execute('SELECT id, day, time FROM worship_services WHERE church_id = ?', (church_id,)):
+                if row['id'] not in original:
+                    new_ids[(row['day'], row['time'])] = row['id']
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        'deleted': len(deletes),
+        'updated': len(updates),
+        'added': len(inserts),
+        'refs': {ref: new_ids.get((services[key]['day'], services[key]['time']))
+                 for ref, key in refs.items() if key in services and key not in original},
+    }
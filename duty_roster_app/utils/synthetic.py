@@ -0,0 +1,138 @@
+# utils/synthetic.py
+import datetime
+import random
+from werkzeug.security import generate_password_hash
+from .duty_load import ensure_duty_load, record_duties
+from .scheduler import build_roster
+
+FIRST_NAMES = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles",
+               "Christopher", "Daniel", "Matthew", "Anthony", "Donald", "Mark", "Paul", "Steven", "Andrew", "Kenneth",
+               "Joshua", "Kevin", "Brian", "George", "Timothy", "Ronald", "Edward", "Jason", "Jeffrey", "Ryan",
+               "Jacob", "Gary", "Nicholas", "Eric", "Jonathan", "Stephen", "Larry", "Justin", "Scott", "Brandon"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+              "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores"]
+
+ACTIVITY_NAMES = ["Singing", "Prayer", "Preaching", "Officiating", "Scripture Reading", "Announcements",
+                  "Lord's Supper", "Contribution", "Ushering", "Greeting", "Sound Booth", "Closing Prayer"]
+
+SERVICE_SLOTS = [("Sunday", "10:00 AM"), ("Sunday", "6:00 PM"), ("Wednesday", "7:00 PM"), ("Sunday", "9:00 AM"),
+                 ("Saturday", "5:00 PM"), ("Thursday", "7:00 PM"), ("Friday", "7:00 PM"), ("Monday", "7:00 PM"),
+                 ("Tuesday", "7:00 PM"), ("Sunday", "8:00 AM")]
+
+
+def member_identity(index, church_id, rng):
+    """Return a (name, email) pair whose email is unique within the whole database."""
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = rng.choice(LAST_NAMES)
+    return f"{first} {last}", f"{first.lower()}.{last.lower()}.{index}@church{church_id}.example.com"
+
+
+def build_dataset(db, churches=1, members=40, services=2, activities=4, years=1, seed=0,
+                  password="memberpass", today=None):
+    """
+    Create several synthetic churches, one transaction per church. Every user shares
+    one password hash, computed once. Returns the list of build_church() results.
+    """
+    password_hash = generate_password_hash(password)
+    created = []
+    for i in range(churches):
+        created.append(build_church(
+            db, name=f"Synthetic Church {i + 1}", members=members, services=services,
+            activities=activities, years=years, seed=seed * 100003 + i,
+            password_hash=password_hash, today=today
+        ))
+        db.commit()
+    return created
+
+
+def _add_months(date, months):
+    month_index = date.year * 12 + date.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def build_church(db, name="Synthetic Church", members=40, services=2, activities=4, years=1,
+                 seed=0, password_hash=None, today=None):
+    """
+    Create a church with members, services, eligibility and `years` of roster history
+    (plus the next two months) using batched inserts. The same seed always produces
+    the same data. The caller commits.
+
+    :param password_hash: hash shared by every synthetic user; hashed once if omitted.
+    :return: dict with church_id, admin_id, admin_email and member_ids.
+    """
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    password_hash = password_hash or generate_password_hash("memberpass")
+    activity_names = ACTIVITY_NAMES[:max(1, min(activities, len(ACTIVITY_NAMES)))]
+
+    church_id = db.execute(
+        'INSERT INTO churches (name, scheduling_rules) VALUES (?, ?)', (name, "Round robin")
+    ).lastrowid
+
+    service_rows = []
+    for day, time_val in SERVICE_SLOTS[:max(1, min(services, len(SERVICE_SLOTS)))]:
+        service_rows.append({'day': day, 'time': time_val, 'activities': ", ".join(activity_names)})
+    db.executemany(
+        'INSERT INTO worship_services (church_id, day, time, activities) VALUES (?, ?, ?, ?)',
+        [(church_id, s['day'], s['time'], s['activities']) for s in service_rows]
+    )
+
+    admin_email = f"admin@church{church_id}.example.com"
+    admin_id = db.execute(
+        'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
+        (f"{name} Admin", admin_email, password_hash, "admin", church_id)
+    ).lastrowid
+
+    db.executemany(
+        'INSERT INTO users (name, email, password, role, church_id) VALUES (?, ?, ?, ?, ?)',
+        [(*member_identity(i, church_id, rng), password_hash, "member", church_id) for i in range(members)]
+    )
+    member_rows = db.execute(
+        'SELECT id, email FROM users WHERE church_id = ? AND role = ? ORDER BY id', (church_id, "member")
+    ).fetchall()
+    member_list = [{'id': row[0], 'email': row[1]} for row in member_rows]
+
+    eligibility = {activity: [] for activity in activity_names}
+    for member in member_list:
+        chosen = [a for a in activity_names if rng.random() < 0.5] or [rng.choice(activity_names)]
+        for activity in chosen:
+            eligibility[activity].append(member['id'])
+    db.executemany(
+        'INSERT INTO activity_eligibility (church_id, user_id, activity) VALUES (?, ?, ?)',
+        [(church_id, user_id, activity) for activity, ids in eligibility.items() for user_id in ids]
+    )
+
+    ensure_duty_load(db)  # before the roster rows below, so they are not counted twice
+    start_date = _add_months(today, -12 * years)
+    end_date = _add_months(today, 2)
+    assignments = build_roster(service_rows, member_list, eligibility, start_date, end_date)
+    db.executemany(
+        'INSERT INTO duty_roster (church_id, duty_date, activity, user_id) VALUES (?, ?, ?, ?)',
+        [(church_id, d.isoformat(), activity, member['id']) for d, activity, member, _ in assignments]
+    )
+    record_duties(db, church_id, [(d, activity, member['id']) for d, activity, member, _ in assignments])
+
+    # Roughly one duty in fifty gets a substitution request.
+    duty_rows = db.execute('SELECT id, user_id FROM duty_roster WHERE church_id = ?', (church_id,)).fetchall()
+    substitutions = []
+    for duty_id, user_id in duty_rows:
+        if len(member_list) > 1 and rng.random() < 0.02:
+            substitute = rng.choice(member_list)['id']
+            if substitute != user_id:
+                status = rng.choice(("pending", "approved", "denied"))
+                substitutions.append((duty_id, user_id, substitute, status, "Out of town"))
+    db.executemany(
+        '''INSERT INTO substitution_requests
+           (duty_id, requester_id, requested_substitute_id, status, message)
+           VALUES (?, ?, ?, ?, ?)''',
+        substitutions
+    )
+
+    return {
+        'church_id': church_id,
+        'admin_id': admin_id,
+        'admin_email': admin_email,
+        'member_ids': [m['id'] for m in member_list],
+    }